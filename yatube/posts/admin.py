@@ -1,13 +1,215 @@
+from datetime import date, datetime, timedelta
+
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.db import models
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
+
+from . import moderation
+from .forms import PostForm
+from .models import (AuthorStats, Comment, Follow, Group, ModerationJob,
+                     Post)
+from .paginators import EstimatedCountPaginator
+from .thumbnails import schedule_thumbnails
+
+
+def period_bounds(first, last, kind):
+    """Годы, месяцы или дни от ``first`` до ``last``: пары (начало, конец)."""
+    if kind == "year":
+        start = date(first.year, 1, 1)
+    elif kind == "month":
+        start = date(first.year, first.month, 1)
+    else:
+        start = first
+    while start <= last:
+        if kind == "year":
+            end = date(start.year + 1, 1, 1)
+        elif kind == "month":
+            end = (start + timedelta(days=32)).replace(day=1)
+        else:
+            end = start + timedelta(days=1)
+        yield start, end
+        start = end
+
+
+class IndexedDatesQuerySet(models.QuerySet):
+    """Навигация по датам в админке без чтения всей таблицы.
+
+    Django строит её через ``dates()``: ``SELECT DISTINCT`` по дате каждой
+    строки. Здесь границы берутся через MIN/MAX, а каждый год, месяц или
+    день проверяется запросом EXISTS по диапазону — это несколько коротких
+    чтений индекса по полю даты.
+    """
+
+    max_periods = 100
+
+    def dates(self, field_name, kind, order="ASC"):
+        if kind not in ("year", "month", "day"):
+            return super().dates(field_name, kind, order)
+        bounds = self.aggregate(
+            first=models.Min(field_name), last=models.Max(field_name)
+        )
+        if bounds["first"] is None:
+            return []
+        first, last = bounds["first"], bounds["last"]
+        if settings.USE_TZ:
+            first, last = timezone.localtime(first), timezone.localtime(last)
+        periods = list(period_bounds(first.date(), last.date(), kind))
+        if len(periods) > self.max_periods:
+            return super().dates(field_name, kind, order)
+        result = [
+            start for start, end in periods
+            if self.filter(**{
+                f"{field_name}__gte": self._moment(start),
+                f"{field_name}__lt": self._moment(end),
+            }).exists()
+        ]
+        return result if order == "ASC" else result[::-1]
+
+    @staticmethod
+    def _moment(day):
+        # Границы те же, что у фильтра админки по дате.
+        moment = datetime(day.year, day.month, day.day)
+        return timezone.make_aware(moment) if settings.USE_TZ else moment
+
+
+class RangeDatesChangeList(ChangeList):
+    """Фильтр навигации по датам — всегда диапазон по индексу.
+
+    Django сам заменяет ``__year``, ``__month`` и ``__day`` навигации на
+    ``__gte``/``__lt``, но только вместе с годом. Месяц или день без года
+    он сравнивает с частью даты каждой строки, читая всю таблицу. Такие
+    ссылки навигация не строит, поэтому здесь они отклоняются.
+    """
+
+    def get_filters(self, request):
+        field = self.date_hierarchy
+        if field and f"{field}__year" not in self.params and (
+            f"{field}__month" in self.params or f"{field}__day" in self.params
+        ):
+            raise IncorrectLookupParameters(
+                "Месяц и день навигации по датам задаются вместе с годом."
+            )
+        return super().get_filters(request)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список, который не замедляется с ростом таблицы.
+
+    Число записей оценивается по статистике базы, связи подгружаются
+    одним запросом через ``list_select_related``, навигация по датам
+    фильтрует диапазоном, а внешние ключи выбираются поиском, а не списком
+    из всех строк.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return RangeDatesChangeList
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexedDatesQuerySet(
+            self.model, query=queryset.query, using=queryset._db
+        )
+
+
+def job_queued(modeladmin, request, job):
+    url = reverse("admin:posts_moderationjob_change", args=[job.pk])
+    modeladmin.message_user(request, format_html(
+        "Задача <a href=\"{}\">#{}</a> поставлена в очередь, "
+        "ход выполнения виден в списке задач модерации.", url, job.pk
+    ))
 
-from .models import Comment, Follow, Group, Post
 
+def delete_authors_content(modeladmin, request, queryset):
+    author_ids = queryset.order_by().values_list(
+        "author_id", flat=True
+    ).distinct()
+    job = moderation.delete_by_authors(author_ids, request.user)
+    job_queued(modeladmin, request, job)
 
-class PostAdmin(admin.ModelAdmin):
+
+delete_authors_content.short_description = (
+    "Удалить все записи и комментарии авторов выбранного"
+)
+
+
+class PostActionForm(ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(), required=False, label="Группа"
+    )
+
+
+class PostAdminForm(PostForm):
+    """Картинка проверяется и пересохраняется так же, как на сайте."""
+
+    class Meta(PostForm.Meta):
+        fields = "__all__"
+
+
+class PostAdmin(LargeTableAdmin):
+    form = PostAdminForm
     list_display = ("pk", "text", "pub_date", "author", "group")
+    list_select_related = ("author", "group")
     search_fields = ("text",)
     list_filter = ("pub_date",)
+    date_hierarchy = "pub_date"
+    autocomplete_fields = ("author", "group")
     empty_value_display = "-пусто-"
+    action_form = PostActionForm
+    actions = (
+        delete_authors_content, "move_to_group", "purge_filtered"
+    )
+
+    def move_to_group(self, request, queryset):
+        try:
+            group = Group.objects.get(pk=request.POST.get("group"))
+        except (Group.DoesNotExist, ValueError):
+            self.message_user(
+                request, "Выберите группу для переноса.", level="error"
+            )
+            return
+        post_ids = queryset.values_list("pk", flat=True)
+        job = moderation.move_to_group(
+            list(post_ids), group.pk, request.user
+        )
+        job_queued(self, request, job)
+
+    move_to_group.short_description = "Перенести выбранные записи в группу"
+
+    def purge_filtered(self, request, queryset):
+        # Удаляются все записи списка с его поиском, фильтрами и датами,
+        # а не только выбранные на странице.
+        changelist = self.get_changelist_instance(request)
+        if not (changelist.query or changelist.get_filters_params()):
+            self.message_user(
+                request, "Сначала отберите записи поиском или фильтрами.",
+                level="error"
+            )
+            return
+        post_ids = changelist.get_queryset(request).values_list(
+            "pk", flat=True
+        )
+        job = moderation.purge_posts(list(post_ids), request.user)
+        job_queued(self, request, job)
+
+    purge_filtered.short_description = (
+        "Удалить все записи, отобранные поиском и фильтрами"
+    )
+
+    def save_model(self, request, obj, form, change):
+        # Как и на сайте, правка не пишет счётчики и миниатюры.
+        obj.save(update_fields=form.update_fields())
+        if "image" in form.changed_data:
+            schedule_thumbnails(obj)
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -18,15 +220,55 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = "-пусто-"
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ("pk", "post", "author", "text", "created")
+    list_select_related = ("post", "author")
+    date_hierarchy = "created"
+    autocomplete_fields = ("post", "author")
+    actions = (delete_authors_content,)
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = ("pk", "user", "author")
+    list_select_related = ("user", "author")
+    autocomplete_fields = ("user", "author")
+
+
+class AuthorStatsAdmin(LargeTableAdmin):
+    list_display = (
+        "pk", "user", "posts_count", "followers_count", "following_count"
+    )
+    list_select_related = ("user",)
+    search_fields = ("user__username",)
+    autocomplete_fields = ("user",)
+
+
+class ModerationJobAdmin(LargeTableAdmin):
+    list_display = (
+        "pk", "action", "status", "progress", "created_by", "created",
+        "finished",
+    )
+    list_select_related = ("created_by",)
+    list_filter = ("action", "status")
+    readonly_fields = ("progress",)
+
+    def progress(self, job):
+        if not job.total:
+            return f"{job.done}"
+        return f"{job.done} из {job.total} ({100 * job.done // job.total}%)"
+
+    progress.short_description = "Прогресс"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(AuthorStats, AuthorStatsAdmin)
+admin.site.register(ModerationJob, ModerationJobAdmin)
@@ -0,0 +1,89 @@
+"""JSON API только для чтения: те же ленты, что и HTML-страницы.
+
+Списки отдают ``{"results": [...], "next": ..., "previous": ...}`` и
+листаются курсорами ``after``/``before``, как страницы сайта. Параметр
+``fields`` оставляет в ответе и в запросе к базе только нужные поля.
+"""
+from django.contrib.auth import get_user_model
+from django.views.decorators.http import condition
+
+from . import conditional
+from .models import Group, Post
+from .page_cache import cache_page_for_guests
+from .paginators import paginate
+from .serializers import (json_response, parse_fields, select, serialize,
+                          serialize_comment)
+from .timeline import FEED_KEYS, timeline_posts
+from .views import ENTRIES_ON_PAGE, comments_page
+
+User = get_user_model()
+
+
+def _error(message, status):
+    return json_response({"error": message}, status=status)
+
+
+def _post_list(request, queryset, keys=("pub_date", "pk")):
+    try:
+        fields = parse_fields(request.GET.get("fields"))
+    except ValueError as error:
+        return _error(str(error), 400)
+    page = paginate(request, select(queryset, fields), ENTRIES_ON_PAGE, keys)
+    return json_response({
+        "results": [serialize(post, fields) for post in page],
+        "next": page.next_cursor,
+        "previous": page.previous_cursor,
+    })
+
+
+@condition(conditional.feed_etag, conditional.feed_modified)
+@cache_page_for_guests(lambda: ["feed", "groups"])
+def index(request):
+    return _post_list(request, Post.objects.all())
+
+
+@condition(conditional.feed_etag, conditional.feed_modified)
+@cache_page_for_guests(lambda slug: ["groups", f"group.{slug}"])
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return _error("Группа не найдена.", 404)
+    return _post_list(request, group.posts.all())
+
+
+@condition(conditional.profile_etag, conditional.profile_modified)
+@cache_page_for_guests(lambda username: ["groups", f"author.{username}"])
+def profile(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return _error("Автор не найден.", 404)
+    return _post_list(request, author.posts.all())
+
+
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return _error("Нужно войти.", 401)
+    return _post_list(request, timeline_posts(request.user), FEED_KEYS)
+
+
+@condition(conditional.post_etag, conditional.post_modified)
+@cache_page_for_guests(lambda username, post_id: [
+    "groups", f"author.{username}", f"post.{post_id}"
+])
+def post_view(request, username, post_id):
+    try:
+        fields = parse_fields(request.GET.get("fields"))
+    except ValueError as error:
+        return _error(str(error), 400)
+    post = select(Post.objects.filter(
+        pk=post_id, author__username=username
+    ), fields).first()
+    if post is None:
+        return _error("Запись не найдена.", 404)
+    comments = comments_page(request, post)
+    data = serialize(post, fields)
+    data["comments"] = {
+        "results": [serialize_comment(comment) for comment in comments],
+        "next": comments.next_cursor,
+    }
+    return json_response(data)
@@ -0,0 +1,95 @@
+"""Валидаторы для условных GET-запросов к страницам записей.
+
+ETag зависит от пользователя: у вошедшего на странице свои кнопки и
+CSRF-токен. Last-Modified отдаётся только гостям, потому что дата не
+различает пользователей. Для несуществующей страницы валидаторов нет.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Max
+
+from .feed_cache import feed_generation, feed_last_modified
+from .models import Post
+
+User = get_user_model()
+
+_missing = object()
+
+
+def _etag(request, *parts):
+    return "-".join(str(part) for part in (*parts, request.user.pk or 0))
+
+
+def _version(value):
+    return int(value.timestamp() * 1000000) if value else 0
+
+
+def _once(request, key, compute):
+    # condition() спрашивает ETag и дату по очереди: читаем базу один раз.
+    values = request.__dict__.setdefault("_conditional", {})
+    if key not in values:
+        values[key] = compute()
+    return values[key]
+
+
+def feed_etag(request, *args, **kwargs):
+    # Поколение ленты меняется при любом изменении записей, комментариев
+    # и групп, в том числе при удалении.
+    return _etag(request, "feed", feed_generation())
+
+
+def feed_modified(request, *args, **kwargs):
+    if request.user.is_authenticated:
+        return None
+    return feed_last_modified()
+
+
+def _author_updated(request, username):
+    def compute():
+        # Счётчики в карточке автора меняются и без правки его записей.
+        rows = User.objects.filter(username=username).values_list(
+            "stats__updated", flat=True
+        )
+        return next(iter(rows), _missing)
+    return _once(request, "author", compute)
+
+
+def profile_etag(request, username):
+    author_updated = _author_updated(request, username)
+    if author_updated is _missing:
+        return None
+    return _etag(
+        request, "profile", feed_generation(), _version(author_updated)
+    )
+
+
+def profile_modified(request, username):
+    author_updated = _author_updated(request, username)
+    if author_updated is _missing or request.user.is_authenticated:
+        return None
+    return max(filter(None, (feed_last_modified(), author_updated)))
+
+
+def _post_updated(request, username, post_id):
+    return _once(request, "post", lambda: Post.objects.filter(
+        pk=post_id, author__username=username
+    ).aggregate(
+        post=Max("updated"), author=Max("author__stats__updated"),
+        group=Max("group__updated"),
+    ))
+
+
+def post_etag(request, username, post_id):
+    updated = _post_updated(request, username, post_id)
+    if updated["post"] is None:
+        return None
+    return _etag(
+        request, "post", post_id, _version(updated["post"]),
+        _version(updated["author"]), _version(updated["group"]),
+    )
+
+
+def post_modified(request, username, post_id):
+    updated = _post_updated(request, username, post_id)
+    if updated["post"] is None or request.user.is_authenticated:
+        return None
+    return max(filter(None, updated.values()))
@@ -0,0 +1,36 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+FEED_GENERATION_KEY = "posts:feed:generation"
+
+
+def feed_generation():
+    """Текущее поколение ленты: входит в ключи кеша её фрагментов.
+
+    Поколение — время последнего изменения в секундах; если изменений
+    за секунду несколько, оно уходит вперёд на единицу.
+    """
+    generation = cache.get(FEED_GENERATION_KEY)
+    if generation is None:
+        # Стартуем со времени, чтобы после потери счётчика не воскресить
+        # фрагменты, закешированные под старыми номерами поколений.
+        cache.add(FEED_GENERATION_KEY, int(time.time()), None)
+        generation = cache.get(FEED_GENERATION_KEY)
+    return generation
+
+
+def feed_last_modified():
+    generation = min(feed_generation(), int(time.time()))
+    return datetime.fromtimestamp(generation, timezone.utc)
+
+
+def invalidate_feed():
+    generation = feed_generation()
+    try:
+        cache.incr(
+            FEED_GENERATION_KEY, max(1, int(time.time()) - generation)
+        )
+    except ValueError:
+        feed_generation()
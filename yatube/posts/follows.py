@@ -0,0 +1,74 @@
+"""Подписки на авторов: по одному и пачками, без гонок.
+
+``get_or_create`` сначала читает, потом вставляет, и два одновременных
+клика по «Подписаться» упираются в ``unique_follow``. Здесь вставка идёт
+через ``bulk_create(ignore_conflicts=True)``: дубликат просто
+пропускается. ``bulk_create`` не шлёт сигналов, поэтому ``follow`` сам
+вызывает ``followed`` — ту же функцию, что и сигнал сохранения ``Follow``.
+Счётчики не сдвигаются, а пересчитываются по таблице подписок, поэтому
+остаются точными при любых гонках.
+"""
+from . import page_cache, timeline
+from .models import AuthorStats, Follow, Post
+
+
+def followed(user_id, author_ids):
+    """Счётчики, ленты и кеш страниц после новых подписок на авторов."""
+    AuthorStats.objects.recount_follows([user_id, *author_ids])
+    for author_id in author_ids:
+        timeline.update_fanout(author_id)
+        # Повторная раскладка после гонки ничего не добавит.
+        timeline.backfill(user_id, author_id)
+    page_cache.purge_authors(user_id, *author_ids)
+
+
+def unfollowed(user_id, author_ids):
+    """Счётчики, ленты и кеш страниц после отписки от авторов."""
+    # Пересчёт, а не сдвиг: при одновременном удалении одной подписки
+    # сигнал приходит дважды, и сдвиг вычел бы её два раза. Строки не
+    # заводятся: подписки удаляются и вместе с самим пользователем.
+    AuthorStats.objects.recount_follows([user_id, *author_ids], create=False)
+    for author_id in author_ids:
+        timeline.trim(user_id, author_id)
+        timeline.update_fanout(author_id)
+    page_cache.purge_authors(user_id, *author_ids)
+
+
+def follow(user_id, author_ids):
+    """Подписывает на авторов и возвращает число новых подписок."""
+    author_ids = set(author_ids) - {user_id}
+    # Читаем до вставки: в SQLite транзакция, начавшаяся с чтения, не
+    # может потом дождаться блокировки на запись.
+    new_ids = author_ids - set(Follow.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).values_list("author_id", flat=True))
+    if not new_ids:
+        return 0
+    Follow.objects.bulk_create((
+        Follow(user_id=user_id, author_id=author_id)
+        for author_id in new_ids
+    ), ignore_conflicts=True)
+    # Как и после save() с сигналом: подписки уже видны всем, и сброшенные
+    # страницы не закешируются заново со старыми данными.
+    followed(user_id, new_ids)
+    return len(new_ids)
+
+
+def follow_group(user_id, group):
+    """Подписывает на всех авторов, писавших в группу."""
+    return follow(user_id, Post.objects.filter(group=group).order_by(
+    ).values_list("author_id", flat=True).distinct())
+
+
+def unfollow(user_id, **authors):
+    """Отписывает от авторов, выбранных условиями на ``Follow``.
+
+    Например, ``author_id__in=[...]`` или ``author__username=...``.
+    Возвращает число удалённых подписок.
+    """
+    follows = Follow.objects.filter(user_id=user_id, **authors)
+    author_ids = set(follows.values_list("author_id", flat=True))
+    if not author_ids:
+        return 0
+    # Остальное сделает unfollowed из сигнала удаления.
+    return follows.filter(author_id__in=author_ids).delete()[0]
@@ -1,5 +1,9 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
 
+from . import images
 from .models import Comment, Post
 
 
@@ -8,6 +12,45 @@ class PostForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         self.fields["group"].empty_label = "Группа не выбрана"
 
+    def clean_image(self):
+        image = self.cleaned_data["image"]
+        if not isinstance(image, UploadedFile):
+            # Картинку не меняли или убрали.
+            return image
+        if image.size > settings.POST_IMAGE_MAX_BYTES:
+            raise forms.ValidationError(
+                "Файл больше %s."
+                % filesizeformat(settings.POST_IMAGE_MAX_BYTES)
+            )
+        # Заголовок уже прочитан при проверке картинки в поле формы.
+        if images.too_many_pixels(*image.image.size):
+            raise forms.ValidationError("Слишком большое изображение.")
+        return images.reencode(image)
+
+    def save(self, commit=True):
+        if "image" in self.changed_data:
+            image = self.cleaned_data["image"]
+            self.instance.image_width = getattr(image, "width", None)
+            self.instance.image_height = getattr(image, "height", None)
+        post = super().save(commit=False)
+        if commit:
+            post.save(update_fields=self.update_fields())
+        return post
+
+    def update_fields(self):
+        """Поля, которые пишет правка записи, или ``None`` для новой.
+
+        Счётчик комментариев и миниатюры меняют сигналы и фоновые задачи:
+        сохранение всей записи вернуло бы им значения, прочитанные в
+        начале запроса.
+        """
+        if self.instance._state.adding:
+            return None
+        fields = [*self.fields, "updated"]
+        if "image" in self.changed_data:
+            fields += ["image_width", "image_height"]
+        return fields
+
     class Meta:
         model = Post
         fields = ("group", "text", "image")
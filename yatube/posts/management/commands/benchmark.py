@@ -0,0 +1,294 @@
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookies import SimpleCookie
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+SCENARIOS = (
+    "index", "group_posts", "profile", "post_view", "follow_index",
+    "add_comment",
+)
+# Те же страницы в JSON API: сравниваются с HTML по байтам и CPU.
+API_SCENARIOS = (
+    "api_index", "api_group_posts", "api_profile", "api_post_view",
+    "api_follow_index",
+)
+QUERIES_RE = re.compile(r'db;dur=[\d.]+;desc="(\d+) q"')
+
+
+def percentile(values, share):
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, round(share * len(values)) - 1))
+    return values[index]
+
+
+class ClientTransport:
+    """Запросы через тестовый клиент Django, без сети."""
+
+    name = "client"
+
+    def __init__(self, reader):
+        self.guest = Client()
+        self.reader = Client()
+        self.reader.force_login(reader)
+
+    def request(self, method, url, data=None, auth=False):
+        client = self.reader if auth else self.guest
+        if method == "POST":
+            response = client.post(url, data)
+        else:
+            response = client.get(url)
+        return (
+            response.status_code, response.get("Server-Timing", ""),
+            len(response.content),
+        )
+
+    def close(self):
+        pass
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class WSGITransport:
+    """Запросы по HTTP к настоящему WSGI-серверу в отдельном потоке."""
+
+    name = "wsgi"
+
+    def __init__(self, reader):
+        self.server = make_server(
+            "127.0.0.1", 0, WSGIHandler(), handler_class=QuietHandler
+        )
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.thread.start()
+        client = Client()
+        client.force_login(reader)
+        self.cookies = {
+            settings.SESSION_COOKIE_NAME:
+                client.cookies[settings.SESSION_COOKIE_NAME].value,
+        }
+        self.csrf_token = None
+
+    def cookie_header(self):
+        return "; ".join(f"{key}={value}" for key, value in
+                         self.cookies.items())
+
+    def open(self, method, url, data=None, auth=False):
+        headers = {}
+        if auth:
+            headers["Cookie"] = self.cookie_header()
+        body = None
+        if method == "POST":
+            body = urllib.parse.urlencode(data or {}).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+            headers["X-CSRFToken"] = self.csrf_token or ""
+            headers["Referer"] = self.base_url + url
+        request = urllib.request.Request(
+            self.base_url + url, data=body, headers=headers, method=method
+        )
+        opener = urllib.request.build_opener(NoRedirect)
+        try:
+            response = opener.open(request)
+        except urllib.error.HTTPError as error:
+            response = error
+        with response:
+            size = len(response.read())
+            for header in response.headers.get_all("Set-Cookie") or ():
+                cookie = SimpleCookie(header)
+                if settings.CSRF_COOKIE_NAME in cookie and auth:
+                    token = cookie[settings.CSRF_COOKIE_NAME].value
+                    self.cookies[settings.CSRF_COOKIE_NAME] = token
+                    self.csrf_token = token
+            return (
+                response.status, response.headers.get("Server-Timing", ""),
+                size,
+            )
+
+    def request(self, method, url, data=None, auth=False):
+        if method == "POST" and self.csrf_token is None:
+            # Форма комментария выставляет CSRF-cookie.
+            self.open("GET", url.rsplit("comment/", 1)[0], auth=True)
+        return self.open(method, url, data, auth)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагружает основные страницы и печатает задержки p50/p95/p99 и "
+        "число запросов к базе в JSON. Сценарий add_comment создаёт "
+        "комментарии, поэтому запускайте его на тестовых данных."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument(
+            "--transport", choices=("client", "wsgi"), default="client"
+        )
+        parser.add_argument(
+            "--scenario", action="append",
+            choices=SCENARIOS + API_SCENARIOS,
+            help="Запустить только указанные сценарии.",
+        )
+        parser.add_argument("--sample", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Куда записать отчёт.")
+        parser.add_argument(
+            "--compare", help="Отчёт прошлого запуска для сравнения."
+        )
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1:
+            raise CommandError("--requests должно быть не меньше 1.")
+        self.random = random.Random(options["seed"])
+        posts = list(Post.objects.select_related("author", "group").order_by(
+            "-pk"
+        )[:options["sample"]])
+        readers = list(Follow.objects.order_by("-pk").values_list(
+            "user_id", flat=True
+        )[:options["sample"]])
+        if not posts:
+            raise CommandError("Нет записей: сначала запустите seed_data.")
+        reader = (
+            User.objects.get(pk=readers[0]) if readers else posts[0].author
+        )
+        self.posts = posts
+        self.groups = [post.group for post in posts if post.group]
+        transport_class = (
+            WSGITransport if options["transport"] == "wsgi"
+            else ClientTransport
+        )
+        transport = transport_class(reader)
+        try:
+            report = {
+                "profile": settings.PROFILE,
+                "transport": transport.name,
+                "requests": options["requests"],
+                "scenarios": {
+                    name: self.run(transport, name, options)
+                    for name in options["scenario"]
+                    or SCENARIOS + API_SCENARIOS
+                },
+            }
+        finally:
+            transport.close()
+        if options["compare"]:
+            with open(options["compare"]) as baseline:
+                self.compare(report, json.load(baseline))
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options["output"]:
+            with open(options["output"], "w") as report_file:
+                report_file.write(output)
+        self.stdout.write(output)
+
+    def target(self, name):
+        post = self.random.choice(self.posts)
+        author = post.author.username
+        namespace = ""
+        if name.startswith("api_"):
+            namespace, name = "api:", name[len("api_"):]
+        if name == "index":
+            return "GET", reverse(namespace + "index"), None, False
+        if name == "group_posts":
+            if not self.groups:
+                return None
+            slug = self.random.choice(self.groups).slug
+            url = reverse(namespace + "group_slug", args=[slug])
+            return "GET", url, None, False
+        if name == "profile":
+            url = reverse(namespace + "profile", args=[author])
+            return "GET", url, None, False
+        if name == "post_view":
+            url = reverse(namespace + "post_view", args=[author, post.pk])
+            return "GET", url, None, False
+        if name == "follow_index":
+            return "GET", reverse(namespace + "follow_index"), None, True
+        url = reverse("add_comment", args=[author, post.pk])
+        return "POST", url, {"text": "Комментарий из бенчмарка"}, True
+
+    def run(self, transport, name, options):
+        latencies = []
+        queries = []
+        sizes = []
+        cpu_times = []
+        errors = 0
+        cold_ms = None
+        total = options["warmup"] + options["requests"]
+        for i in range(total):
+            target = self.target(name)
+            if target is None:
+                return {"skipped": True}
+            started = time.perf_counter()
+            cpu_started = time.process_time()
+            status, timing, size = transport.request(*target)
+            elapsed = (time.perf_counter() - started) * 1000
+            cpu = (time.process_time() - cpu_started) * 1000
+            if cold_ms is None:
+                # Первый запрос платит за разбор шаблонов и соединение.
+                cold_ms = elapsed
+            if i < options["warmup"]:
+                continue
+            if status >= 400:
+                errors += 1
+            latencies.append(elapsed)
+            sizes.append(size)
+            cpu_times.append(cpu)
+            match = QUERIES_RE.search(timing)
+            if match:
+                queries.append(int(match.group(1)))
+        return {
+            "errors": errors,
+            "cold_ms": cold_ms,
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "mean_ms": sum(latencies) / len(latencies),
+            # Сервер и клиент работают в одном процессе, поэтому это CPU
+            # на запрос целиком, без ожидания базы и сети.
+            "cpu_ms_per_request": sum(cpu_times) / len(cpu_times),
+            "bytes_per_request": sum(sizes) / len(sizes),
+            "queries_per_request": (
+                sum(queries) / len(queries) if queries else None
+            ),
+        }
+
+    @staticmethod
+    def compare(report, baseline):
+        for name, result in report["scenarios"].items():
+            previous = baseline.get("scenarios", {}).get(name)
+            if not previous or result.get("skipped") or previous.get(
+                "skipped"
+            ):
+                continue
+            result["p95_change"] = result["p95_ms"] / previous["p95_ms"] - 1
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Готовит миниатюры для записей с картинками."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Пересоздать миниатюры и у записей, где они уже есть.",
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image="").exclude(image__isnull=True)
+        if not options["all"]:
+            # Миниатюры, сделанные до появления srcset, тоже неполные.
+            posts = posts.filter(thumbnail_srcset="")
+        post_ids = posts.values_list("pk", flat=True)
+        total = 0
+        for post_id in post_ids.iterator():
+            generate_thumbnails(post_id)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Подготовлены миниатюры для {total} записей."
+        ))
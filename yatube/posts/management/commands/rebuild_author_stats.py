@@ -0,0 +1,51 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+
+from posts.models import AuthorStats, Follow, Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает счётчики записей и подписок авторов. Ленты после "
+        "него пересобирает rebuild_timelines."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        counts = defaultdict(dict)
+        queries = (
+            ("posts_count", Post.objects, "author"),
+            ("followers_count", Follow.objects, "author"),
+            ("following_count", Follow.objects, "user"),
+        )
+        for field, manager, key in queries:
+            rows = manager.order_by().values(key).annotate(total=Count("pk"))
+            for row in rows.iterator():
+                counts[row[key]][field] = row["total"]
+        with transaction.atomic():
+            AuthorStats.objects.all().delete()
+            fanout_limit = settings.TIMELINE_FANOUT_LIMIT
+            stats = [
+                AuthorStats(
+                    user_id=user_id, **fields, timeline_fanout=(
+                        fields.get("followers_count", 0) < fanout_limit
+                    )
+                )
+                for user_id, fields in counts.items()
+            ]
+            # Явный batch_size Django 2.2 не сверяет с лимитом базы на
+            # число параметров в запросе (у SQLite их 999).
+            fields = AuthorStats._meta.concrete_fields
+            limit = connection.ops.bulk_batch_size(fields, stats)
+            AuthorStats.objects.bulk_create(
+                stats, batch_size=max(1, min(options["batch_size"], limit))
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Пересчитана статистика {len(counts)} авторов."
+        ))
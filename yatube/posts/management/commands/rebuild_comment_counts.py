@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает количество комментариев у записей."
+
+    def handle(self, *args, **options):
+        updated = Post.objects.recount_comments()
+        self.stdout.write(self.style.SUCCESS(
+            f"Пересчитаны комментарии {updated} записей."
+        ))
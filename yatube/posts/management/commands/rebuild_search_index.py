@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Перестраивает полнотекстовый индекс записей и комментариев."
+
+    def handle(self, *args, **options):
+        get_search_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS("Поисковый индекс перестроен."))
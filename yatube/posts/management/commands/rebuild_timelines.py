@@ -0,0 +1,29 @@
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import Follow, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = "Заново раскладывает записи по лентам подписок."
+
+    def handle(self, *args, **options):
+        follows = Follow.objects.order_by("author_id").values_list(
+            "author_id", "user_id"
+        )
+        with transaction.atomic():
+            TimelineEntry.objects.all().delete()
+            # Записи автора читаются один раз на всех его подписчиков.
+            for author_id, rows in groupby(
+                follows.iterator(), key=itemgetter(0)
+            ):
+                timeline.backfill_followers(
+                    author_id, [user_id for _, user_id in rows]
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f"Собраны ленты для {follows.count()} подписок."
+        ))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.moderation import claimable_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет задачи модерации из очереди и продолжает брошенные: "
+        "те, что дольше MODERATION_JOB_LEASE секунд не отмечали ход. "
+        "Можно запускать рядом с работающим сайтом; с --loop команда "
+        "работает постоянно и ждёт новые задачи."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true")
+        parser.add_argument(
+            "--interval", type=float, default=5,
+            help="Сколько секунд ждать, когда очередь пуста.",
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            job_ids = list(claimable_jobs().order_by("pk").values_list(
+                "pk", flat=True
+            ))
+            for job_id in job_ids:
+                run_job(job_id)
+            processed += len(job_ids)
+            if not options["loop"]:
+                break
+            if not job_ids:
+                time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Обработано задач модерации: {processed}."
+        ))
@@ -0,0 +1,181 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.feed_cache import invalidate_feed
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу синтетическими данными для нагрузочных тестов: "
+        "число подписчиков и активность авторов распределены по степенному "
+        "закону, часть групп заметно популярнее остальных."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--groups", type=int, default=100)
+        parser.add_argument("--posts", type=int, default=1000000)
+        parser.add_argument("--comments", type=int, default=2000000)
+        parser.add_argument("--follows", type=int, default=500000)
+        parser.add_argument(
+            "--days", type=int, default=365,
+            help="За сколько последних дней распределить даты записей.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--skip-derived", action="store_true",
+            help="Не пересчитывать счётчики, ленты и поисковый индекс.",
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        prefix = f"seed{int(time.time())}"
+        users = self.create_users(prefix, options["users"])
+        groups = self.create_groups(prefix, options["groups"])
+        # Вес пользователя — его популярность: и как автора, и как цели
+        # подписки. Парето даёт длинный хвост «звёзд».
+        weights = [self.random.paretovariate(1.2) for _ in users]
+        group_weights = [
+            self.random.paretovariate(1.0) for _ in groups
+        ]
+        posts = self.create_posts(
+            options["posts"], users, weights, groups, group_weights
+        )
+        self.spread_pub_dates(posts, options["days"])
+        self.create_comments(options["comments"], users, posts)
+        self.create_follows(options["follows"], users, weights)
+        if not options["skip_derived"]:
+            for command in (
+                "rebuild_author_stats", "rebuild_comment_counts",
+                "rebuild_timelines", "rebuild_search_index",
+            ):
+                call_command(command, stdout=self.stdout)
+        invalidate_feed()
+        self.stdout.write(self.style.SUCCESS("Данные созданы."))
+
+    def bulk(self, model, objects, total):
+        batch = []
+        done = 0
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+                done += len(batch)
+                batch = []
+                self.stdout.write(f"{model.__name__}: {done}/{total}")
+        if batch:
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def create_users(self, prefix, total):
+        password = make_password(None)
+        self.bulk(User, (
+            User(username=f"{prefix}_user{i}", password=password)
+            for i in range(total)
+        ), total)
+        return list(User.objects.filter(
+            username__startswith=f"{prefix}_"
+        ).values_list("pk", flat=True))
+
+    def create_groups(self, prefix, total):
+        self.bulk(Group, (
+            Group(
+                title=f"Группа {i}", slug=f"{prefix}-group-{i}",
+                description=f"Описание группы {i}",
+            )
+            for i in range(total)
+        ), total)
+        return list(Group.objects.filter(
+            slug__startswith=f"{prefix}-"
+        ).values_list("pk", flat=True))
+
+    def create_posts(self, total, users, weights, groups, group_weights):
+        authors = self.random.choices(users, weights, k=total)
+        post_groups = (
+            self.random.choices(groups, group_weights, k=total)
+            if groups else [None] * total
+        )
+        first_pk = (Post.objects.order_by("-pk").values_list(
+            "pk", flat=True
+        ).first() or 0) + 1
+        self.bulk(Post, (
+            Post(
+                text=f"Запись {i}: " + " ".join(self.random.choices(
+                    WORDS, k=self.random.randint(5, 60)
+                )),
+                author_id=author,
+                # Примерно треть записей вне групп.
+                group_id=group if i % 3 else None,
+            )
+            for i, (author, group) in enumerate(zip(authors, post_groups))
+        ), total)
+        return list(Post.objects.filter(pk__gte=first_pk).order_by(
+            "pk"
+        ).values_list("pk", flat=True))
+
+    def spread_pub_dates(self, posts, days):
+        """Разносит даты записей по последним ``days`` дням.
+
+        ``pub_date`` с ``auto_now_add`` при вставке получает текущее
+        время, поэтому даты проставляются отдельно. Порядок дат совпадает
+        с порядком ключей, а записей тем больше, чем ближе к сегодня.
+        """
+        now = timezone.now()
+        period = timedelta(days=days).total_seconds()
+        offsets = sorted((
+            period * self.random.random() ** 2 for _ in posts
+        ), reverse=True)
+        for start in range(0, len(posts), self.batch_size):
+            Post.objects.bulk_update([
+                Post(pk=pk, pub_date=now - timedelta(seconds=offset))
+                for pk, offset in zip(
+                    posts[start:start + self.batch_size],
+                    offsets[start:start + self.batch_size],
+                )
+            ], ["pub_date"])
+            done = min(start + self.batch_size, len(posts))
+            self.stdout.write(f"Даты записей: {done}/{len(posts)}")
+
+    def create_comments(self, total, users, posts):
+        if not posts:
+            return
+        # Обсуждают в основном свежие записи.
+        post_weights = [1 / (len(posts) - i) for i in range(len(posts))]
+        targets = self.random.choices(posts, post_weights, k=total)
+        self.bulk(Comment, (
+            Comment(
+                post_id=post,
+                author_id=self.random.choice(users),
+                text=" ".join(self.random.choices(
+                    WORDS, k=self.random.randint(2, 20)
+                )),
+            )
+            for post in targets
+        ), total)
+
+    def create_follows(self, total, users, weights):
+        followers = self.random.choices(users, k=total)
+        authors = self.random.choices(users, weights, k=total)
+        self.bulk(Follow, (
+            Follow(user_id=user, author_id=author)
+            for user, author in zip(followers, authors)
+            if user != author
+        ), total)
+
+
+WORDS = (
+    "город осень парк кофе книга музыка кино поезд море лес дом работа "
+    "утро вечер друзья выходные рецепт прогулка фото новости спорт код "
+    "кошка собака дождь солнце снег путешествие вопрос идея проект"
+).split()
@@ -0,0 +1,71 @@
+# Generated by Django 2.2.6 on 2026-10-18 04:38
+
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BATCH_SIZE = 1000
+
+
+def insert_entries(TimelineEntry, connection, entries):
+    # Явный batch_size Django 2.2 не сверяет с лимитом базы на число
+    # параметров в запросе (у SQLite их 999).
+    fields = TimelineEntry._meta.concrete_fields
+    limit = connection.ops.bulk_batch_size(fields, entries)
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=max(1, min(BATCH_SIZE, limit)),
+        ignore_conflicts=True,
+    )
+
+
+def fill_timelines(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    connection = schema_editor.connection
+    follows = Follow.objects.order_by('author_id').values_list('author_id', 'user_id')
+    batch = []
+    # Записи автора читаются один раз на всех его подписчиков.
+    for author_id, rows in groupby(follows.iterator(), key=itemgetter(0)):
+        posts = list(Post.objects.filter(author_id=author_id).order_by().values_list('pk', 'pub_date'))
+        for _, user_id in rows:
+            for pk, pub_date in posts:
+                batch.append(TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date))
+                if len(batch) == BATCH_SIZE:
+                    insert_entries(TimelineEntry, connection, batch)
+                    batch = []
+    if batch:
+        insert_entries(TimelineEntry, connection, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0016_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post', verbose_name='Запись')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Читатель')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date'], name='timeline_user_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
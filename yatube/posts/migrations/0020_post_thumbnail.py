@@ -0,0 +1,28 @@
+# Generated by Django 2.2.6 on 2026-10-18 04:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота миниатюры'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_url',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Миниатюра'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина миниатюры'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.6 on 2026-10-18 05:05
+
+from django.db import migrations, models
+
+
+def copy_pub_date(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(updated=models.F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменено'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(copy_pub_date, migrations.RunPython.noop),
+    ]
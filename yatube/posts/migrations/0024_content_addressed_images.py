@@ -0,0 +1,47 @@
+# Generated by Django 2.2.6 on 2026-10-18 05:31
+
+from django.db import migrations, models
+from django.db.models import Count, F
+import posts.storage
+
+
+def count_image_refs(apps, schema_editor):
+    # Старые записи ссылаются на свои файлы без учёта: без этих ссылок
+    # удаление такой же новой картинки стёрло бы их файл.
+    Post = apps.get_model('posts', 'Post')
+    MediaBlob = apps.get_model('posts', 'MediaBlob')
+    images = Post.objects.exclude(image='').exclude(
+        image__isnull=True
+    ).values('image').annotate(refs=Count('pk')).order_by()
+    for row in images:
+        blob, created = MediaBlob.objects.get_or_create(
+            name=row['image'], defaults={'refs': row['refs']}
+        )
+        if not created:
+            MediaBlob.objects.filter(pk=blob.pk).update(
+                refs=F('refs') + row['refs']
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('refs', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Изображение'),
+        ),
+        migrations.RunPython(count_image_refs, migrations.RunPython.noop),
+    ]
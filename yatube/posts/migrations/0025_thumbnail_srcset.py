@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 05:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_srcset',
+            field=models.TextField(blank=True, editable=False, verbose_name='Варианты миниатюры'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.6 on 2026-10-18 05:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_thumbnail_srcset'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['-created', '-id'], name='comment_created_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.6 on 2026-10-18 05:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0026_comment_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('delete_by_authors', 'Удаление записей и комментариев авторов'), ('move_to_group', 'Перенос записей в группу'), ('purge_text', 'Удаление записей по тексту')], max_length=32, verbose_name='Операция')),
+                ('params', models.TextField(verbose_name='Параметры')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=16, verbose_name='Состояние')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Всего')),
+                ('done', models.PositiveIntegerField(default=0, verbose_name='Обработано')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='moderation_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Модератор')),
+            ],
+            options={
+                'ordering': ['-created'],
+            },
+        ),
+    ]
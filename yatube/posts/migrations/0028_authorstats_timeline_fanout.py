@@ -0,0 +1,34 @@
+# Generated by Django 2.2.6 on 2026-10-18 05:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_heavy_authors(apps, schema_editor):
+    # Записи таких авторов теперь читаются напрямую, а их строки в лентах
+    # уже не обновляются: удаляем их вместе с переключением.
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    heavy = AuthorStats.objects.filter(
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    )
+    TimelineEntry.objects.filter(
+        post__author_id__in=heavy.values('user_id')
+    ).delete()
+    heavy.update(timeline_fanout=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='timeline_fanout',
+            field=models.BooleanField(default=True, verbose_name='Раскладка по лентам'),
+        ),
+        migrations.RunPython(mark_heavy_authors, migrations.RunPython.noop),
+    ]
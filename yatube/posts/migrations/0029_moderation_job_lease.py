@@ -0,0 +1,37 @@
+# Generated by Django 2.2.6 on 2026-10-18 06:09
+
+from django.db import migrations, models
+
+
+def retire_purge_text(apps, schema_editor):
+    # Удаление по тексту заменено удалением отобранных записей; старые
+    # параметры новая операция не понимает.
+    ModerationJob = apps.get_model('posts', 'ModerationJob')
+    jobs = ModerationJob.objects.filter(action='purge_text')
+    jobs.filter(status__in=('pending', 'running')).update(
+        status='failed',
+        error='Операция устарела, повторите её из списка записей.',
+    )
+    jobs.update(action='purge_posts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0027_moderation_jobs'),
+        ('posts', '0028_authorstats_timeline_fanout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationjob',
+            name='heartbeat',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последняя отметка'),
+        ),
+        migrations.AlterField(
+            model_name='moderationjob',
+            name='action',
+            field=models.CharField(choices=[('delete_by_authors', 'Удаление записей и комментариев авторов'), ('move_to_group', 'Перенос записей в группу'), ('purge_posts', 'Удаление отобранных записей')], max_length=32, verbose_name='Операция'),
+        ),
+        migrations.RunPython(retire_purge_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0029_moderation_job_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+    ]
@@ -1,12 +1,34 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .storage import post_image_storage
 
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        return self.select_related("author", "group")
+
+    def recount_comments(self):
+        comments = Comment.objects.filter(
+            post=models.OuterRef("pk")
+        ).order_by().values("post").annotate(
+            total=models.Count("pk")
+        ).values("total")
+        return self.update(
+            comment_count=Coalesce(models.Subquery(comments), 0)
+        )
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name="Текст")
     pub_date = models.DateTimeField("Дата публикации", auto_now_add=True)
+    # Меняется и при правке записи, и при изменении её комментариев.
+    updated = models.DateTimeField("Дата изменения", auto_now=True)
     author = models.ForeignKey(
         User, on_delete=models.CASCADE,
         related_name="posts", verbose_name="Автор"
@@ -16,21 +38,57 @@ class Post(models.Model):
         blank=True, null=True, verbose_name="Группа"
     )
     image = models.ImageField(
-        upload_to="posts/", blank=True,
-        null=True, verbose_name="Изображение"
+        upload_to="posts/", storage=post_image_storage, blank=True,
+        null=True, db_index=True, verbose_name="Изображение"
+    )
+    image_width = models.PositiveIntegerField(
+        "Ширина изображения", blank=True, null=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        "Высота изображения", blank=True, null=True, editable=False
+    )
+    comment_count = models.PositiveIntegerField(
+        "Комментариев", default=0, editable=False
+    )
+    thumbnail_url = models.CharField(
+        "Миниатюра", max_length=255, blank=True, editable=False
+    )
+    thumbnail_width = models.PositiveIntegerField(
+        "Ширина миниатюры", blank=True, null=True, editable=False
     )
+    thumbnail_height = models.PositiveIntegerField(
+        "Высота миниатюры", blank=True, null=True, editable=False
+    )
+    # Готовое значение атрибута srcset: «url 320w, url 640w, …».
+    thumbnail_srcset = models.TextField(
+        "Варианты миниатюры", blank=True, editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=["-pub_date", "-id"], name="post_date_idx"),
+            models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="post_author_date_idx"
+            ),
+            models.Index(
+                fields=["group", "-pub_date", "-id"],
+                name="post_group_date_idx"
+            ),
+        ]
 
 
 class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name="Заголовок")
     slug = models.SlugField(unique=True, verbose_name="URL")
     description = models.TextField(verbose_name="Описание")
+    updated = models.DateTimeField("Дата изменения", auto_now=True)
 
     def __str__(self):
         return self.title
@@ -53,6 +111,16 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(
+                fields=["post", "-created", "-id"],
+                name="comment_post_created_id_idx",
+            ),
+            # Общий список комментариев в админке.
+            models.Index(
+                fields=["-created", "-id"], name="comment_created_idx"
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -71,3 +139,213 @@ class Follow(models.Model):
                 fields=["user", "author"], name="unique_follow"
             )
         ]
+        indexes = [
+            models.Index(
+                fields=["author", "user"], name="follow_author_user_idx"
+            ),
+        ]
+
+
+class AuthorStatsManager(models.Manager):
+    def count_for(self, user_id):
+        # Счётчики сохраняются, поэтому считаются по той базе, в которую
+        # пишутся, а не по возможно отставшей реплике.
+        db = router.db_for_write(self.model)
+        follows = Follow.objects.using(db)
+        followers_count = follows.filter(author_id=user_id).count()
+        return {
+            "posts_count": Post.objects.using(db).filter(
+                author_id=user_id
+            ).count(),
+            "followers_count": followers_count,
+            "following_count": follows.filter(user_id=user_id).count(),
+            "timeline_fanout": (
+                followers_count < settings.TIMELINE_FANOUT_LIMIT
+            ),
+        }
+
+    def for_author(self, user):
+        stats = self.filter(user=user).first()
+        if stats is None:
+            stats, _ = self.update_or_create(
+                user=user, defaults=self.count_for(user.pk)
+            )
+        return stats
+
+    def recount_follows(self, user_ids, create=True):
+        """Пересчитывает подписки и подписчиков по таблице ``Follow``.
+
+        В отличие от ``shift`` не зависит от того, сколько строк реально
+        вставила или удалила конкурирующая операция. С ``create=False``
+        недостающие строки статистики не заводятся.
+        """
+        def total(key):
+            return Coalesce(models.Subquery(
+                Follow.objects.filter(
+                    **{key: models.OuterRef("user_id")}
+                ).order_by().values(key).annotate(
+                    total=models.Count("pk")
+                ).values("total")
+            ), 0)
+        self.filter(user_id__in=user_ids).update(
+            followers_count=total("author"),
+            following_count=total("user"),
+            updated=timezone.now(),
+        )
+        if not create:
+            return
+        missing = User.objects.filter(
+            pk__in=user_ids, stats__isnull=True
+        ).values_list("pk", flat=True)
+        self.bulk_create((
+            self.model(user_id=user_id, **self.count_for(user_id))
+            for user_id in missing
+        ), ignore_conflicts=True)
+
+    def shift(self, user_id, **deltas):
+        # Счётчик не уходит ниже нуля, даже если строка статистики
+        # разошлась с таблицами: иначе удаление упало бы на CHECK.
+        changes = {
+            field: Greatest(models.F(field) + delta, 0)
+            if delta < 0 else models.F(field) + delta
+            for field, delta in deltas.items()
+        }
+        updated = self.filter(user_id=user_id).update(
+            updated=timezone.now(), **changes
+        )
+        if updated or min(deltas.values()) < 0:
+            return
+        try:
+            with transaction.atomic():
+                self.create(user_id=user_id, **self.count_for(user_id))
+        except IntegrityError:
+            self.shift(user_id, **deltas)
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE,
+        related_name="stats", verbose_name="Автор"
+    )
+    posts_count = models.PositiveIntegerField("Записей", default=0)
+    followers_count = models.PositiveIntegerField("Подписчиков", default=0)
+    following_count = models.PositiveIntegerField("Подписок", default=0)
+    # Записи автора раскладываются по лентам подписчиков; у авторов с
+    # огромным числом подписчиков они читаются напрямую, см. timeline.
+    timeline_fanout = models.BooleanField(
+        "Раскладка по лентам", default=True
+    )
+    updated = models.DateTimeField("Изменено", auto_now=True)
+
+    objects = AuthorStatsManager()
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name="timeline", verbose_name="Читатель"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE,
+        related_name="timeline_entries", verbose_name="Запись"
+    )
+    pub_date = models.DateTimeField("Дата публикации")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_timeline_entry"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-post"],
+                name="timeline_user_date_idx"
+            )
+        ]
+
+
+class MediaBlobManager(models.Manager):
+    def acquire(self, name):
+        updated = self.filter(name=name).update(refs=models.F("refs") + 1)
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                self.create(name=name, refs=1)
+        except IntegrityError:
+            self.acquire(name)
+
+    def release(self, name):
+        """Снимает ссылку и возвращает ``True``, если она была последней."""
+        self.filter(name=name, refs__gt=0).update(
+            refs=models.F("refs") - 1
+        )
+        return bool(self.filter(name=name, refs=0).delete()[0])
+
+
+class MediaBlob(models.Model):
+    """Файл в хранилище по содержимому и число записей, которые на него
+    ссылаются; см. posts.storage."""
+
+    name = models.CharField("Файл", max_length=255, unique=True)
+    refs = models.PositiveIntegerField("Ссылок", default=0)
+
+    objects = MediaBlobManager()
+
+    def __str__(self):
+        return self.name
+
+
+class ModerationJob(models.Model):
+    """Массовая операция модерации, выполняемая в фоне частями;
+    см. posts.moderation."""
+
+    DELETE_BY_AUTHORS = "delete_by_authors"
+    MOVE_TO_GROUP = "move_to_group"
+    PURGE_POSTS = "purge_posts"
+    ACTIONS = (
+        (DELETE_BY_AUTHORS, "Удаление записей и комментариев авторов"),
+        (MOVE_TO_GROUP, "Перенос записей в группу"),
+        (PURGE_POSTS, "Удаление отобранных записей"),
+    )
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Готово"),
+        (FAILED, "Ошибка"),
+    )
+
+    action = models.CharField("Операция", max_length=32, choices=ACTIONS)
+    # Параметры операции в JSON: авторы, записи или группа.
+    params = models.TextField("Параметры")
+    status = models.CharField(
+        "Состояние", max_length=16, choices=STATUSES, default=PENDING
+    )
+    total = models.PositiveIntegerField("Всего", default=0)
+    done = models.PositiveIntegerField("Обработано", default=0)
+    error = models.TextField("Ошибка", blank=True)
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, blank=True, null=True,
+        related_name="moderation_jobs", verbose_name="Модератор"
+    )
+    created = models.DateTimeField("Создана", auto_now_add=True)
+    # Аренда задачи: процесс, который её выполняет, обновляет отметку
+    # после каждой части; см. posts.moderation.
+    heartbeat = models.DateTimeField(
+        "Последняя отметка", blank=True, null=True
+    )
+    finished = models.DateTimeField("Завершена", blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created"]
+
+    def __str__(self):
+        return f"{self.get_action_display()} #{self.pk}"
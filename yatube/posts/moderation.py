@@ -0,0 +1,203 @@
+"""Массовая модерация в фоне.
+
+Действие в админке только создаёт ``ModerationJob``; строки удаляются
+или переносятся в отдельном процессе частями по ``CHUNK_SIZE``, каждая
+часть в своей транзакции. После каждой части задача сохраняет число
+обработанных строк — это её прогресс в админке — и отметку ``heartbeat``.
+Задачу без отметки дольше ``MODERATION_JOB_LEASE`` секунд считают
+брошенной и продолжает ``manage.py run_moderation_jobs``, в том числе
+запущенный рядом с сайтом: удалённых строк уже нет, а уже перенесённые
+записи пропускаются.
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import page_cache, workers
+from .feed_cache import invalidate_feed
+from .models import Comment, Group, ModerationJob, Post
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+
+class LeaseLost(Exception):
+    """Задачу, долго не оставлявшую отметок, забрал другой процесс."""
+
+
+def _submit(job_id):
+    if not settings.MODERATION_WORKERS:
+        run_job(job_id)
+        return
+    workers.get_executor(
+        "moderation", settings.MODERATION_WORKERS
+    ).submit(run_job, job_id)
+
+
+def enqueue(action, params, user=None):
+    job = ModerationJob.objects.create(
+        action=action, params=json.dumps(params), created_by=user
+    )
+    transaction.on_commit(lambda: _submit(job.pk))
+    return job
+
+
+def delete_by_authors(author_ids, user=None):
+    """Удаляет все записи и комментарии авторов."""
+    return enqueue(
+        ModerationJob.DELETE_BY_AUTHORS,
+        {"author_ids": sorted(set(author_ids))}, user,
+    )
+
+
+def move_to_group(post_ids, group_id, user=None):
+    return enqueue(
+        ModerationJob.MOVE_TO_GROUP,
+        {"post_ids": sorted(set(post_ids)), "group_id": group_id}, user,
+    )
+
+
+def purge_posts(post_ids, user=None):
+    """Удаляет записи, отобранные в админке поиском и фильтрами."""
+    return enqueue(
+        ModerationJob.PURGE_POSTS, {"post_ids": sorted(set(post_ids))}, user
+    )
+
+
+def _chunks(queryset):
+    """Первичные ключи строк по возрастанию, частями по ``CHUNK_SIZE``.
+
+    Каждая часть читается от последнего ключа предыдущей, поэтому вся
+    выборка проходится один раз, сколько бы частей ни было.
+    """
+    last = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=last).order_by("pk").values_list(
+            "pk", flat=True
+        )[:CHUNK_SIZE])
+        if not pks:
+            return
+        yield pks
+        last = pks[-1]
+
+
+def _touch(job, **fields):
+    # Отметка продлевает аренду задачи, только пока задача за нами.
+    heartbeat = timezone.now()
+    updated = ModerationJob.objects.filter(
+        pk=job.pk, heartbeat=job.heartbeat
+    ).update(heartbeat=heartbeat, **fields)
+    if not updated:
+        raise LeaseLost(job.pk)
+    job.heartbeat = heartbeat
+
+
+def _start(job, total):
+    job.total, job.done = total, 0
+    _touch(job, total=total, done=0)
+
+
+def _advance(job, count):
+    job.done += count
+    _touch(job, done=job.done)
+
+
+def _delete(job, queryset):
+    # Удаление идёт через ORM, чтобы сработали сигналы: счётчики, кеши,
+    # поиск и ссылки на картинки.
+    model = queryset.model
+    for pks in _chunks(queryset):
+        with transaction.atomic():
+            model.objects.filter(pk__in=pks).delete()
+        _advance(job, len(pks))
+
+
+def _delete_by_authors(job, author_ids):
+    comments = Comment.objects.filter(author_id__in=author_ids)
+    posts = Post.objects.filter(author_id__in=author_ids)
+    _start(job, comments.count() + posts.count())
+    _delete(job, comments)
+    _delete(job, posts)
+
+
+def _move_to_group(job, post_ids, group_id):
+    group = Group.objects.get(pk=group_id)
+    _start(job, len(post_ids))
+    for start in range(0, len(post_ids), CHUNK_SIZE):
+        chunk = post_ids[start:start + CHUNK_SIZE]
+        posts = Post.objects.filter(pk__in=chunk).exclude(group=group)
+        with transaction.atomic():
+            moved = list(posts.values_list(
+                "pk", "author__username", "group__slug"
+            ))
+            Post.objects.filter(pk__in=[pk for pk, *_ in moved]).update(
+                group=group, updated=timezone.now()
+            )
+        # Сигналы при update() не приходят: страницы сбрасываем сами,
+        # один раз на часть.
+        if moved:
+            tags = {"feed", f"group.{group.slug}"}
+            for pk, username, slug in moved:
+                tags.update((f"post.{pk}", f"author.{username}"))
+                if slug:
+                    tags.add(f"group.{slug}")
+            page_cache.purge(*tags)
+            invalidate_feed()
+        _advance(job, len(chunk))
+
+
+def _purge_posts(job, post_ids):
+    _start(job, len(post_ids))
+    for start in range(0, len(post_ids), CHUNK_SIZE):
+        chunk = post_ids[start:start + CHUNK_SIZE]
+        with transaction.atomic():
+            Post.objects.filter(pk__in=chunk).delete()
+        _advance(job, len(chunk))
+
+
+RUNNERS = {
+    ModerationJob.DELETE_BY_AUTHORS: _delete_by_authors,
+    ModerationJob.MOVE_TO_GROUP: _move_to_group,
+    ModerationJob.PURGE_POSTS: _purge_posts,
+}
+
+
+def claimable_jobs():
+    """Задачи в очереди и брошенные: без отметки дольше аренды."""
+    expired = timezone.now() - timedelta(
+        seconds=settings.MODERATION_JOB_LEASE
+    )
+    return ModerationJob.objects.filter(
+        Q(status=ModerationJob.PENDING)
+        | Q(status=ModerationJob.RUNNING, heartbeat__lt=expired)
+        | Q(status=ModerationJob.RUNNING, heartbeat__isnull=True)
+    )
+
+
+def run_job(job_id):
+    """Выполняет задачу из очереди или брошенную; занятую другим
+    процессом пропускает."""
+    claimed = claimable_jobs().filter(pk=job_id).update(
+        status=ModerationJob.RUNNING, heartbeat=timezone.now()
+    )
+    if not claimed:
+        return
+    job = ModerationJob.objects.get(pk=job_id)
+    status, error = ModerationJob.DONE, ""
+    try:
+        RUNNERS[job.action](job, **json.loads(job.params))
+    except LeaseLost:
+        logger.warning("Задачу модерации #%s продолжил другой процесс", job_id)
+        return
+    except Exception as exception:
+        logger.exception("Задача модерации #%s не выполнена", job_id)
+        status, error = ModerationJob.FAILED, str(exception)
+    ModerationJob.objects.filter(pk=job_id, heartbeat=job.heartbeat).update(
+        status=status, error=error, finished=timezone.now()
+    )
@@ -0,0 +1,131 @@
+"""Кеш целых страниц для гостей.
+
+Страница помечается метками: ``feed`` у главной, ``group.<slug>``,
+``author.<username>``, ``post.<id>`` и общая ``groups`` у всех страниц с
+названиями групп. В ключ страницы входят версии её меток, поэтому
+``purge`` выбрасывает из кеша только страницы с затронутыми метками.
+Страница для кеша собирается из основной базы: отставшая реплика отдала
+бы данные до сброса, и они жили бы в кеше под новыми версиями меток.
+Попадания видны в ``/metrics/`` под префиксом ``posts:page``.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from yatube.db_router import primary_reads
+
+from .models import Group, Post
+
+User = get_user_model()
+
+PAGE_KEY = "posts:page:{}"
+# Версии меток — ключи поколений: двухуровневый кеш держит их только в
+# общем кеше, см. yatube.cache.
+TAG_KEY = "posts:page:generation:{}"
+HEADER = "X-Page-Cache"
+
+
+def tag_versions(tags):
+    keys = [TAG_KEY.format(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Как и у ленты, после потери версии начинаем со времени,
+            # чтобы не вернуть страницы, закешированные под старыми.
+            cache.add(key, time.time_ns() // 1000, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def page_key(request, tags):
+    source = "|".join(map(str, (
+        request.get_full_path(), *tags, *tag_versions(tags)
+    )))
+    return PAGE_KEY.format(hashlib.md5(source.encode()).hexdigest())
+
+
+def purge(*tags):
+    for tag in tags:
+        try:
+            cache.incr(TAG_KEY.format(tag))
+        except ValueError:
+            # Версии нет — страниц под ней в кеше тоже не найдут.
+            pass
+
+
+def purge_post(post, previous_group_id=None):
+    """Страницы, на которых видна запись; учитывает и прежнюю группу."""
+    groups = []
+    if previous_group_id and previous_group_id != post.group_id:
+        groups = Group.objects.filter(
+            pk__in=[previous_group_id, post.group_id]
+        ).values_list("slug", flat=True)
+    elif post.group_id:
+        groups = [post.group.slug]
+    purge(
+        "feed", f"post.{post.pk}", f"author.{post.author.username}",
+        *(f"group.{slug}" for slug in groups),
+    )
+
+
+def purge_comment(comment):
+    # Число комментариев видно во всех списках, где есть запись.
+    row = Post.objects.filter(pk=comment.post_id).values_list(
+        "author__username", "group__slug"
+    ).first()
+    if row is None:
+        return
+    username, group_slug = row
+    purge("feed", f"post.{comment.post_id}", f"author.{username}")
+    if group_slug:
+        purge(f"group.{group_slug}")
+
+
+def purge_authors(*user_ids):
+    usernames = User.objects.filter(pk__in=user_ids).values_list(
+        "username", flat=True
+    )
+    purge(*(f"author.{username}" for username in usernames))
+
+
+def cache_page_for_guests(tags):
+    """Кеширует ответ представления для посетителей без сессии.
+
+    ``tags`` получает именованные аргументы представления и возвращает
+    метки страницы.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ("GET", "HEAD")
+                or settings.SESSION_COOKIE_NAME in request.COOKIES
+            ):
+                return view(request, *args, **kwargs)
+            key = page_key(request, tags(**kwargs))
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response[HEADER] = "hit"
+                return response
+            with primary_reads():
+                response = view(request, *args, **kwargs)
+            if (
+                response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+            ):
+                cache.set(
+                    key, (response.content, response["Content-Type"]),
+                    settings.PAGE_CACHE_TIMEOUT,
+                )
+            response[HEADER] = "miss"
+            return response
+        return wrapper
+    return decorator
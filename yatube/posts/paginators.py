@@ -0,0 +1,159 @@
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+# Ключ за пределами 64-битного целого база не примет: SQLite бросает
+# OverflowError ещё до запроса.
+MAX_PK = 2 ** 63 - 1
+
+
+def encode_cursor(obj, date_key="pub_date"):
+    value = f"{getattr(obj, date_key).isoformat()}|{obj.pk}"
+    return urlsafe_base64_encode(force_bytes(value))
+
+
+def decode_cursor(token):
+    try:
+        pub_date, pk = force_str(urlsafe_base64_decode(token)).split("|")
+        pub_date, pk = parse_datetime(pub_date), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if pub_date is None or not -MAX_PK <= pk <= MAX_PK:
+        return None
+    return pub_date, pk
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинатор по ``(pub_date, id)`` или другой паре ``keys``.
+
+    Не выполняет ``COUNT(*)`` и не использует ``OFFSET``: любая страница
+    выбирается по индексу так же быстро, как первая. Страница знает только
+    о соседях, поэтому ``num_pages`` описывает лишь текущее окно.
+    """
+
+    has_next = False
+    has_previous = False
+
+    def __init__(self, object_list, per_page, keys=("pub_date", "pk")):
+        super().__init__(object_list, per_page)
+        self.date_key, self.pk_key = keys
+
+    @property
+    def num_pages(self):
+        return 1 + self.has_previous + self.has_next
+
+    def seek(self, queryset, cursor, direction):
+        # Условие на дату отдельно от дизъюнкции, чтобы база могла начать
+        # чтение индекса сразу с курсора, а не отбрасывать строки до него.
+        pub_date, pk = cursor
+        date_key, pk_key = self.date_key, self.pk_key
+        return queryset.filter(**{
+            f"{date_key}__{direction}e": pub_date
+        }).filter(
+            Q(**{f"{date_key}__{direction}": pub_date})
+            | Q(**{f"{pk_key}__{direction}": pk})
+        )
+
+    def get_page(self, after=None, before=None):
+        after = decode_cursor(after) if after else None
+        before = decode_cursor(before) if before else None
+        queryset = self.object_list
+        limit = self.per_page + 1
+        rows = []
+        if before is not None:
+            rows = list(self.seek(queryset, before, "gt").order_by(
+                self.date_key, self.pk_key
+            )[:limit])
+            self.has_next = True
+            self.has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            if not rows:
+                # Перед курсором записей нет: отдаём первую страницу.
+                after = None
+        if not rows:
+            if after is not None:
+                queryset = self.seek(queryset, after, "lt")
+            rows = list(queryset.order_by(
+                f"-{self.date_key}", f"-{self.pk_key}"
+            )[:limit])
+            self.has_next = len(rows) > self.per_page
+            self.has_previous = after is not None
+            rows = rows[:self.per_page]
+        # Ссылки на соседей есть, только если для них есть курсор.
+        self.has_next = self.has_next and bool(rows)
+        self.has_previous = self.has_previous and bool(rows)
+        page = self._get_page(rows, 1 + self.has_previous, self)
+        page.next_cursor = (
+            encode_cursor(rows[-1], self.date_key)
+            if self.has_next else None
+        )
+        page.previous_cursor = (
+            encode_cursor(rows[0], self.date_key)
+            if self.has_previous else None
+        )
+        return page
+
+
+def paginate(request, post_list, per_page, keys=("pub_date", "pk")):
+    paginator = CursorPaginator(post_list, per_page, keys)
+    return paginator.get_page(
+        after=request.GET.get("after"), before=request.GET.get("before")
+    )
+
+
+def estimate_count(model, using):
+    """Примерное число строк таблицы по статистике базы или ``None``."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [table],
+            )
+        elif connection.vendor == "sqlite":
+            # sqlite_stat1 появляется после ANALYZE; первое число в stat —
+            # строки таблицы. Без статистики оцениваем по наибольшему rowid.
+            try:
+                cursor.execute(
+                    "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1",
+                    [table],
+                )
+                row = cursor.fetchone()
+            except DatabaseError:
+                row = None
+            if row is not None:
+                return int(row[0].split()[0])
+            cursor.execute(
+                f"SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}"
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки без ``COUNT(*)`` по всей таблице.
+
+    Для неотфильтрованного списка число записей берётся из статистики
+    базы, если таблица больше ``threshold``. Отфильтрованные списки
+    (поиск, даты, фильтры) считаются точно: их сужает индекс.
+    """
+
+    threshold = 50000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.threshold:
+                return estimate
+        return super().count
@@ -0,0 +1,174 @@
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils.module_loading import import_string
+
+from .models import Comment, Post
+
+
+class SearchBackend(ABC):
+    """Интерфейс полнотекстового поиска по записям и комментариям.
+
+    ``search`` возвращает идентификаторы записей в порядке релевантности.
+    Методы индексации вызываются сигналами; бэкенду, которому не нужен
+    свой индекс, переопределять их не нужно.
+    """
+
+    def index_post(self, post):
+        pass
+
+    def remove_post(self, post):
+        pass
+
+    def index_comment(self, comment):
+        pass
+
+    def remove_comment(self, comment):
+        pass
+
+    def rebuild(self):
+        pass
+
+    @abstractmethod
+    def search(self, query, offset, limit):
+        """Идентификаторы записей ``[offset:offset + limit]`` выдачи."""
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """Индекс FTS5 в таблице ``posts_search``.
+
+    Запись хранится под rowid ``2 * id``, комментарий — ``2 * id + 1``,
+    поэтому обновление и удаление документа идут по первичному ключу.
+    """
+
+    table = "posts_search"
+
+    def _replace(self, rowid, body, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid = %s", [rowid]
+            )
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, body, post_id) "
+                "VALUES (%s, %s, %s)",
+                [rowid, body, post_id],
+            )
+
+    def _delete(self, rowid):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid = %s", [rowid]
+            )
+
+    def index_post(self, post):
+        self._replace(2 * post.pk, post.text, post.pk)
+
+    def remove_post(self, post):
+        self._delete(2 * post.pk)
+
+    def index_comment(self, comment):
+        self._replace(2 * comment.pk + 1, comment.text, comment.post_id)
+
+    def remove_comment(self, comment):
+        self._delete(2 * comment.pk + 1)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, body, post_id) "
+                "SELECT 2 * id, text, id FROM posts_post"
+            )
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, body, post_id) "
+                "SELECT 2 * id + 1, text, post_id FROM posts_comment"
+            )
+
+    @staticmethod
+    def match_expression(query):
+        # Каждое слово берётся в кавычки: пользовательский ввод не должен
+        # разбираться как синтаксис FTS5.
+        terms = ['"{}"'.format(term.replace('"', '""'))
+                 for term in query.split()]
+        return " ".join(terms)
+
+    def search(self, query, offset, limit):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT post_id FROM {self.table} "
+                f"WHERE {self.table} MATCH %s "
+                "GROUP BY post_id ORDER BY MIN(rank), post_id DESC "
+                "LIMIT %s OFFSET %s",
+                [expression, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Поиск через ``tsvector`` PostgreSQL.
+
+    Векторы строятся выражением, поэтому синхронизировать нечего; для
+    больших таблиц его стоит поддержать GIN-индексом по тому же выражению.
+    """
+
+    config = "russian"
+
+    def search(self, query, offset, limit):
+        from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                                    SearchVector)
+
+        search_query = SearchQuery(query, config=self.config)
+        comments = Comment.objects.annotate(
+            document=SearchVector("text", config=self.config)
+        ).filter(post=OuterRef("pk"), document=search_query)
+        posts = Post.objects.annotate(
+            document=SearchVector("text", config=self.config),
+            has_comment=Exists(comments),
+        ).annotate(
+            rank=SearchRank(F("document"), search_query)
+        ).filter(Q(document=search_query) | Q(has_comment=True))
+        return list(posts.order_by("-rank", "-pk").values_list(
+            "pk", flat=True
+        )[offset:offset + limit])
+
+
+def get_search_backend():
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+class SearchPaginator(Paginator):
+    """Страницы ранжированной выдачи без подсчёта числа результатов."""
+
+    has_next = False
+
+    def __init__(self, query, per_page, backend=None):
+        super().__init__([], per_page)
+        self.query = query
+        self.backend = backend or get_search_backend()
+        self.number = 1
+
+    @property
+    def num_pages(self):
+        return self.number + self.has_next
+
+    def get_page(self, number):
+        try:
+            self.number = max(int(number), 1)
+        except (TypeError, ValueError):
+            self.number = 1
+        offset = (self.number - 1) * self.per_page
+        post_ids = self.backend.search(
+            self.query, offset, self.per_page + 1
+        )
+        self.has_next = len(post_ids) > self.per_page
+        post_ids = post_ids[:self.per_page]
+        posts = Post.objects.for_feed().in_bulk(post_ids)
+        return self._get_page(
+            [posts[pk] for pk in post_ids if pk in posts], self.number, self
+        )
@@ -0,0 +1,88 @@
+"""Сериализация записей и комментариев в JSON без форм и ModelSerializer.
+
+Поле записи описано колонками, которые нужны ему из базы, и функцией,
+достающей значение из объекта. По выбранным полям ``select`` сужает
+запрос до этих колонок и нужных связей, а ``serialize`` собирает словарь.
+"""
+import json
+
+from django.http import HttpResponse
+
+
+def _thumbnail(post):
+    if not post.thumbnail_url:
+        return None
+    return {
+        "url": post.thumbnail_url,
+        "width": post.thumbnail_width,
+        "height": post.thumbnail_height,
+        "srcset": post.thumbnail_srcset,
+    }
+
+
+POST_FIELDS = {
+    "id": ((), lambda post: post.pk),
+    "text": (("text",), lambda post: post.text),
+    "pub_date": ((), lambda post: post.pub_date.isoformat()),
+    "author": (("author__username",), lambda post: post.author.username),
+    "group": (
+        ("group__slug",),
+        lambda post: post.group.slug if post.group_id else None
+    ),
+    "image": (
+        ("image",), lambda post: post.image.url if post.image else None
+    ),
+    "thumbnail": (
+        (
+            "thumbnail_url", "thumbnail_width", "thumbnail_height",
+            "thumbnail_srcset",
+        ),
+        _thumbnail
+    ),
+    "comment_count": (("comment_count",), lambda post: post.comment_count),
+}
+DEFAULT_FIELDS = tuple(POST_FIELDS)
+# Дата нужна курсору пагинации при любом наборе полей.
+BASE_COLUMNS = ("pub_date",)
+
+
+def parse_fields(value):
+    """Поля из параметра ``fields=id,text``; без параметра — все."""
+    if not value:
+        return DEFAULT_FIELDS
+    fields = tuple(dict.fromkeys(filter(None, value.split(","))))
+    unknown = [name for name in fields if name not in POST_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+    return fields
+
+
+def select(queryset, fields):
+    columns = set(BASE_COLUMNS)
+    for name in fields:
+        columns.update(POST_FIELDS[name][0])
+    relations = {column.split("__")[0] for column in columns if "__" in column}
+    if relations:
+        # Без аргументов select_related() подтянул бы все связи.
+        queryset = queryset.select_related(*relations)
+    return queryset.only(*columns)
+
+
+def serialize(post, fields):
+    return {name: POST_FIELDS[name][1](post) for name in fields}
+
+
+def serialize_comment(comment):
+    return {
+        "id": comment.pk,
+        "author": comment.author.username,
+        "text": comment.text,
+        "created": comment.created.isoformat(),
+    }
+
+
+def json_response(data, status=200):
+    content = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return HttpResponse(
+        content, content_type="application/json", status=status
+    )
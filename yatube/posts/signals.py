@@ -0,0 +1,136 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import follows, page_cache, thumbnails, timeline
+from .feed_cache import invalidate_feed
+from .models import AuthorStats, Comment, Follow, Group, Post
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.shift(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    AuthorStats.objects.shift(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        follows.followed(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    follows.unfollowed(instance.user_id, [instance.author_id])
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F("comment_count") + 1, updated=timezone.now()
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(
+        comment_count=F("comment_count") - 1, updated=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def feed_changed(sender, **kwargs):
+    invalidate_feed()
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, **kwargs):
+    # Запись могли перенести в другую группу: её старую страницу тоже
+    # нужно сбросить. Старую картинку после замены нужно отпустить.
+    instance._previous_group_id = None
+    instance._previous_image = None
+    # Новый файл сохраняется в хранилище уже после этого сигнала.
+    instance._image_uploaded = (
+        bool(instance.image) and not instance.image._committed
+    )
+    if not instance._state.adding:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            "group_id", "image"
+        ).first()
+        if previous is not None:
+            instance._previous_group_id, instance._previous_image = previous
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_pages_changed(sender, instance, **kwargs):
+    page_cache.purge_post(
+        instance, getattr(instance, "_previous_group_id", None)
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_pages_changed(sender, instance, **kwargs):
+    page_cache.purge_comment(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_pages_changed(sender, instance, **kwargs):
+    page_cache.purge("groups", f"group.{instance.slug}")
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_image_replaced(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_image", None)
+    # Та же картинка, загруженная заново, тоже взяла лишнюю ссылку.
+    if previous and (
+        previous != instance.image.name or instance._image_uploaded
+    ):
+        thumbnails.release_image(previous)
+
+
+@receiver(post_delete, sender=Post)
+def post_image_deleted(sender, instance, **kwargs):
+    if instance.image:
+        thumbnails.release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, **kwargs):
+    get_search_backend().index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    get_search_backend().remove_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_indexed(sender, instance, **kwargs):
+    get_search_backend().index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_unindexed(sender, instance, **kwargs):
+    get_search_backend().remove_comment(instance)
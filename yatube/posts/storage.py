@@ -0,0 +1,81 @@
+"""Хранилище картинок записей, адресуемое по содержимому.
+
+Файл сохраняется под SHA-256 своего содержимого:
+``posts/ab/cd/abcd….webp``. Одна и та же картинка у сотни записей лежит
+на диске один раз, и миниатюры у неё тоже общие. Число ссылок на файл
+хранит ``MediaBlob``, и файл удаляется, только когда ссылок не осталось.
+Ссылки на картинки, появившиеся без ``save``, берут сами их авторы:
+загрузка выгрузки и миграция, посчитавшая старые записи.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _blobs():
+    # Модели сами ссылаются на хранилище, поэтому берём модель при вызове.
+    return apps.get_model("posts", "MediaBlob").objects
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Одинаковое имя значит одинаковое содержимое: файл не переименуем.
+        return name
+
+    @staticmethod
+    def hashed_name(name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            directory, digest[:2], digest[2:4], digest + extension
+        )
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        # Ссылка появляется раньше файла: освобождение, идущее в это время,
+        # увидит её и не удалит файл, который мы решили не записывать.
+        _blobs().acquire(name)
+        if not self.exists(name):
+            self._write(name, content)
+        return name
+
+    def _write(self, name, content):
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Пишем рядом и переименовываем: одновременные загрузки одной
+        # картинки не увидят друг друга недописанными.
+        with tempfile.NamedTemporaryFile(
+            dir=directory, delete=False
+        ) as temporary:
+            for chunk in content.chunks(CHUNK_SIZE):
+                temporary.write(chunk)
+        if self.file_permissions_mode is not None:
+            os.chmod(temporary.name, self.file_permissions_mode)
+        os.replace(temporary.name, path)
+
+    def release(self, name):
+        """Снимает ссылку на файл; удаляет его, если ссылок не осталось.
+
+        Возвращает ``True``, если файл удалён.
+        """
+        with transaction.atomic():
+            if not _blobs().release(name):
+                return False
+            # Удаляем до конца транзакции, пока новая ссылка не может
+            # появиться.
+            self.delete(name)
+        return True
+
+
+post_image_storage = ContentAddressedStorage()
@@ -0,0 +1,14 @@
+from django import template
+
+register = template.Library()
+
+# Карточка занимает всю ширину экрана телефона и не шире 960px на
+# больших экранах.
+CARD_SIZES = "(max-width: 960px) 100vw, 960px"
+
+
+@register.inclusion_tag("includes/post_image.html")
+def post_image(post, eager=False):
+    """Картинка записи с srcset и размерами; грузится лениво, кроме
+    ``eager`` — первой картинки, видной без прокрутки."""
+    return {"post": post, "eager": eager, "sizes": CARD_SIZES}
@@ -0,0 +1,157 @@
+from datetime import date, datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..admin import IndexedDatesQuerySet, PostAdmin
+from ..models import Comment, Group, Post
+from ..paginators import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="pass"
+        )
+        cls.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        for year in (2019, 2019, 2021):
+            post = Post.objects.create(
+                text=f"Запись {year}", author=cls.admin, group=cls.group
+            )
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=timezone.make_aware(datetime(year, 3, 5))
+            )
+            Comment.objects.create(post=post, author=cls.admin, text="Ок")
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self, name):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_related_objects_are_joined(self):
+        for name, add in (
+            ("admin:posts_post_changelist", lambda author: Post(
+                text="Ещё", author=author, group=self.group
+            )),
+            ("admin:posts_comment_changelist", lambda author: Comment(
+                post=Post.objects.create(text="Ещё", author=author),
+                author=author, text="Ещё"
+            )),
+        ):
+            # Годы новых записей добавили бы проверок навигации по датам.
+            with self.subTest(name=name), mock.patch.object(
+                IndexedDatesQuerySet, "max_periods", 0
+            ):
+                before = self.changelist_queries(name)
+                for i in range(5):
+                    author = User.objects.create_user(username=f"{name}{i}")
+                    add(author).save()
+                self.assertEqual(self.changelist_queries(name), before)
+
+    def test_unfiltered_count_is_estimated(self):
+        Post.objects.order_by("pk").first().delete()
+        with mock.patch.object(EstimatedCountPaginator, "threshold", 0):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(
+                    reverse("admin:posts_post_changelist")
+                )
+            # Оценка по наибольшему rowid: удалённая запись ещё учтена.
+            self.assertEqual(response.context["cl"].result_count, 3)
+            self.assertFalse(any(
+                "COUNT(" in query["sql"] for query in queries
+            ))
+            response = self.client.get(
+                reverse("admin:posts_post_changelist"), {"q": "2019"}
+            )
+            self.assertEqual(response.context["cl"].result_count, 1)
+
+    def test_small_table_is_counted_exactly(self):
+        Post.objects.filter(text="Запись 2021").delete()
+        response = self.client.get(reverse("admin:posts_post_changelist"))
+        self.assertEqual(response.context["cl"].result_count, 2)
+
+    def test_date_hierarchy(self):
+        indexed = IndexedDatesQuerySet(Post)
+        for kind in ("year", "month", "day"):
+            with self.subTest(kind=kind):
+                self.assertEqual(
+                    list(indexed.dates("pub_date", kind)),
+                    list(Post.objects.dates("pub_date", kind)),
+                )
+        response = self.client.get(
+            reverse("admin:posts_post_changelist"), {"pub_date__year": 2019}
+        )
+        self.assertEqual(response.context["cl"].result_count, 2)
+        self.assertContains(response, "pub_date__month=3")
+        self.assertEqual(
+            indexed.dates("pub_date", "year", "DESC"),
+            [date(2021, 1, 1), date(2019, 1, 1)],
+        )
+
+    def test_date_drill_down_filters_by_range(self):
+        url = reverse("admin:posts_post_changelist")
+        for params in (
+            {"pub_date__year": 2019},
+            {"pub_date__year": 2019, "pub_date__month": 3},
+            {"pub_date__year": 2019, "pub_date__month": 3, "pub_date__day": 5},
+        ):
+            with self.subTest(params=params):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, params)
+                self.assertEqual(response.context["cl"].result_count, 2)
+                self.assertFalse(any(
+                    "extract" in query["sql"] for query in queries
+                ))
+        for params in ({"pub_date__month": 3}, {"pub_date__day": 5}):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertRedirects(
+                    response, f"{url}?e=1", fetch_redirect_response=False
+                )
+
+    def test_foreign_keys_use_autocomplete(self):
+        post = Post.objects.first()
+        response = self.client.get(
+            reverse("admin:posts_post_change", args=[post.pk])
+        )
+        self.assertContains(response, "data-ajax--url", count=2)
+        response = self.client.get(
+            reverse("admin:auth_user_autocomplete"), {"term": "adm"}
+        )
+        self.assertEqual(
+            [result["text"] for result in response.json()["results"]],
+            ["admin"],
+        )
+
+    def test_change_keeps_counters_written_meanwhile(self):
+        post = Post.objects.first()
+        # Пока админ правил запись, её прокомментировали и обработали.
+        Post.objects.filter(pk=post.pk).update(
+            comment_count=7, thumbnail_url="/thumb.jpg"
+        )
+        with mock.patch.object(PostAdmin, "get_object", return_value=post):
+            response = self.client.post(
+                reverse("admin:posts_post_change", args=[post.pk]),
+                {"text": "Правка", "author": self.admin.pk},
+            )
+        self.assertEqual(response.status_code, 302)
+        post.refresh_from_db()
+        self.assertEqual(post.text, "Правка")
+        self.assertIsNone(post.group)
+        self.assertEqual(post.comment_count, 7)
+        self.assertEqual(post.thumbnail_url, "/thumb.jpg")
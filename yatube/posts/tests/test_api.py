@@ -0,0 +1,136 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from ..models import Comment, Follow, Group, Post
+from ..serializers import DEFAULT_FIELDS
+from ..views import ENTRIES_ON_PAGE
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        for i in range(ENTRIES_ON_PAGE + 3):
+            cls.post = Post.objects.create(
+                text=f"Запись {i}", author=cls.author, group=cls.group
+            )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text="Ответ"
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(ApiTests.reader)
+
+    def test_lists_match_html_pages(self):
+        pages = {
+            "index": [],
+            "group_slug": ["group"],
+            "profile": ["author"],
+            "follow_index": [],
+        }
+        for name, args in pages.items():
+            with self.subTest(page=name):
+                html = self.reader_client.get(reverse(name, args=args))
+                response = self.reader_client.get(
+                    reverse(f"api:{name}", args=args)
+                )
+                self.assertEqual(response["Content-Type"], "application/json")
+                data = response.json()
+                self.assertEqual(
+                    [post["id"] for post in data["results"]],
+                    [post.pk for post in html.context["page"]]
+                )
+                self.assertEqual(
+                    data["next"], html.context["page"].next_cursor
+                )
+
+    def test_post_fields(self):
+        data = self.guest_client.get(reverse("api:index")).json()
+        post = data["results"][0]
+        self.assertEqual(tuple(post), DEFAULT_FIELDS)
+        self.assertEqual(post["id"], ApiTests.post.pk)
+        self.assertEqual(post["author"], "author")
+        self.assertEqual(post["group"], "group")
+        self.assertEqual(post["comment_count"], 1)
+        self.assertIsNone(post["image"])
+
+    def test_cursor_continues_list(self):
+        url = reverse("api:index")
+        first = self.guest_client.get(url).json()
+        second = self.guest_client.get(url, {"after": first["next"]}).json()
+        self.assertEqual(len(second["results"]), 3)
+        self.assertIsNone(second["next"])
+        self.assertLess(
+            second["results"][0]["id"], first["results"][-1]["id"]
+        )
+
+    def test_out_of_range_cursor_returns_first_page(self):
+        url = reverse("api:index")
+        first = self.guest_client.get(url).json()
+        pub_date = ApiTests.post.pub_date.isoformat()
+        cursor = urlsafe_base64_encode(force_bytes(f"{pub_date}|{10 ** 30}"))
+        response = self.guest_client.get(url, {"after": cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], first["results"])
+
+    def test_fields_narrow_response_and_query(self):
+        url = reverse("api:index")
+        with CaptureQueriesContext(connection) as queries:
+            data = self.guest_client.get(url, {"fields": "id,text"}).json()
+        self.assertEqual(set(data["results"][0]), {"id", "text"})
+        sql = next(
+            query["sql"] for query in queries
+            if 'FROM "posts_post"' in query["sql"]
+        )
+        self.assertNotIn("auth_user", sql)
+        self.assertNotIn('"posts_post"."image"', sql)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.guest_client.get(
+            reverse("api:index"), {"fields": "id,password"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.json()["error"])
+
+    def test_post_view_includes_comments(self):
+        url = reverse("api:post_view", args=["author", ApiTests.post.pk])
+        data = self.guest_client.get(url).json()
+        self.assertEqual(data["text"], ApiTests.post.text)
+        self.assertEqual(
+            [comment["text"] for comment in data["comments"]["results"]],
+            ["Ответ"]
+        )
+        self.assertIsNone(data["comments"]["next"])
+
+    def test_missing_objects_return_json_404(self):
+        urls = (
+            reverse("api:group_slug", args=["missing"]),
+            reverse("api:profile", args=["missing"]),
+            reverse("api:post_view", args=["author", 0]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn("error", response.json())
+
+    def test_follow_requires_login(self):
+        response = self.guest_client.get(reverse("api:follow_index"))
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,290 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ..models import (AuthorStats, Comment, Follow, Group, Post,
+                      TimelineEntry)
+from ..search import get_search_backend
+from ..transfer import Checkpoint
+
+User = get_user_model()
+
+
+class RebuildAuthorStatsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username="author", password="123"
+        )
+        cls.reader = User.objects.create_user(
+            username="reader", password="123"
+        )
+        cls.post = Post.objects.create(text="Тест", author=cls.author)
+        Comment.objects.create(post=cls.post, author=cls.reader, text="Ответ")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_rebuild_author_stats(self):
+        AuthorStats.objects.update(
+            posts_count=100, followers_count=100, following_count=100
+        )
+        call_command("rebuild_author_stats", stdout=StringIO())
+        author = AuthorStats.objects.get(user=self.author)
+        reader = AuthorStats.objects.get(user=self.reader)
+        self.assertEqual(author.posts_count, 1)
+        self.assertEqual(author.followers_count, 1)
+        self.assertEqual(author.following_count, 0)
+        self.assertEqual(reader.following_count, 1)
+
+    def test_rebuild_author_stats_caps_batch_size(self):
+        # Столько строк в одной пачке не помещается ни в один лимит SQLite.
+        User.objects.bulk_create(
+            User(username=f"writer{i}") for i in range(7000)
+        )
+        Post.objects.bulk_create(
+            Post(text="Тест", author=author)
+            for author in User.objects.filter(username__startswith="writer")
+        )
+        call_command(
+            "rebuild_author_stats", batch_size=100000, stdout=StringIO()
+        )
+        self.assertEqual(AuthorStats.objects.count(), 7002)
+
+    def test_rebuild_comment_counts(self):
+        Post.objects.update(comment_count=100)
+        call_command("rebuild_comment_counts", stdout=StringIO())
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comment_count, 1)
+
+    def test_rebuild_timelines(self):
+        TimelineEntry.objects.all().delete()
+        call_command("rebuild_timelines", stdout=StringIO())
+        self.assertQuerysetEqual(
+            TimelineEntry.objects.filter(user=self.reader),
+            [self.post.pk],
+            transform=lambda entry: entry.post_id
+        )
+
+    def test_rebuild_timelines_reads_posts_once_per_author(self):
+        for i in range(5):
+            Follow.objects.create(
+                user=User.objects.create_user(username=f"follower{i}"),
+                author=self.author,
+            )
+        with CaptureQueriesContext(connection) as queries:
+            call_command("rebuild_timelines", stdout=StringIO())
+        posts_reads = [
+            query for query in queries
+            if query["sql"].startswith("SELECT")
+            and 'FROM "posts_post"' in query["sql"]
+        ]
+        self.assertEqual(len(posts_reads), 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(post=self.post).count(), 6
+        )
+
+    def test_rebuild_search_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM posts_search")
+        call_command("rebuild_search_index", stdout=StringIO())
+        backend = get_search_backend()
+        self.assertEqual(backend.search("Тест", 0, 10), [self.post.pk])
+        self.assertEqual(backend.search("Ответ", 0, 10), [self.post.pk])
+
+
+class SeedAndBenchmarkCommandTest(TestCase):
+    def test_seed_data(self):
+        call_command(
+            "seed_data", users=20, groups=3, posts=600, comments=50,
+            follows=40, stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 600)
+        self.assertEqual(Comment.objects.count(), 50)
+        stats = AuthorStats.objects.aggregate(total=Sum("posts_count"))
+        self.assertEqual(stats["total"], 600)
+        self.assertEqual(
+            TimelineEntry.objects.count(),
+            Post.objects.filter(author__following__isnull=False).count(),
+        )
+
+    def test_seed_data_spreads_pub_dates(self):
+        call_command(
+            "seed_data", users=5, groups=1, posts=200, comments=0,
+            follows=0, days=30, skip_derived=True, stdout=StringIO(),
+        )
+        dates = list(Post.objects.order_by("pk").values_list(
+            "pub_date", flat=True
+        ))
+        self.assertEqual(dates, sorted(dates))
+        self.assertGreater(dates[-1] - dates[0], timedelta(days=7))
+        self.assertLessEqual(dates[-1] - dates[0], timedelta(days=30))
+
+    def test_benchmark_requires_requests(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark", requests=0, stdout=StringIO())
+
+    def test_benchmark_report(self):
+        call_command(
+            "seed_data", users=5, groups=1, posts=20, comments=5,
+            follows=5, stdout=StringIO(),
+        )
+        out = StringIO()
+        call_command(
+            "benchmark", requests=2, warmup=0,
+            scenario=["index", "profile", "api_index"], stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(
+            set(report["scenarios"]), {"index", "profile", "api_index"}
+        )
+        index = report["scenarios"]["index"]
+        self.assertEqual(index["errors"], 0)
+        self.assertIsNotNone(index["p95_ms"])
+        self.assertIsNotNone(index["queries_per_request"])
+        api_index = report["scenarios"]["api_index"]
+        self.assertEqual(api_index["errors"], 0)
+        self.assertLess(
+            api_index["bytes_per_request"], index["bytes_per_request"]
+        )
+
+
+class TransferCommandTest(TestCase):
+    small_gif = (
+        b"\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21\xf9\x04"
+        b"\x01\x0a\x00\x01\x00\x2c\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02"
+        b"\x02\x4c\x01\x00\x3b"
+    )
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.export_dir = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+        self.addCleanup(shutil.rmtree, self.export_dir, True)
+        self.author = User.objects.create_user(username="author")
+        self.reader = User.objects.create_user(username="reader")
+        self.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        self.post = Post.objects.create(
+            text="Запись", author=self.author, group=self.group,
+            image=SimpleUploadedFile("small.gif", self.small_gif),
+        )
+        Post.objects.filter(pk=self.post.pk).update(
+            pub_date=datetime(2020, 1, 1, tzinfo=timezone.utc)
+        )
+        for i in range(5):
+            Comment.objects.create(
+                post=self.post, author=self.reader, text=f"Ответ {i}"
+            )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def export(self, **options):
+        call_command(
+            "posts_export", self.export_dir, stdout=StringIO(),
+            stderr=StringIO(), **options
+        )
+
+    def load(self, **options):
+        out = StringIO()
+        call_command(
+            "posts_import", self.export_dir, stdout=out,
+            stderr=StringIO(), **options
+        )
+        return out.getvalue()
+
+    def wipe(self):
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        shutil.rmtree(self.media_root)
+
+    def test_round_trip(self):
+        self.export(batch_size=2)
+        self.wipe()
+        self.load(batch_size=2)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.author.username, "author")
+        self.assertEqual(post.group.slug, "group")
+        self.assertEqual(
+            post.pub_date, datetime(2020, 1, 1, tzinfo=timezone.utc)
+        )
+        self.assertEqual(post.comment_count, 5)
+        with post.image.open() as image:
+            self.assertEqual(image.read(), self.small_gif)
+        self.assertTrue(Follow.objects.filter(
+            user__username="reader", author__username="author"
+        ).exists())
+        self.assertEqual(
+            AuthorStats.objects.get(user=post.author).followers_count, 1
+        )
+        self.assertTrue(TimelineEntry.objects.filter(post=post).exists())
+
+    def test_export_resume_skips_finished_rows(self):
+        self.export(batch_size=2)
+        path = os.path.join(self.export_dir, "comments.jsonl")
+        with open(path, "rb") as comments:
+            expected = comments.read()
+        checkpoint = Checkpoint(
+            os.path.join(self.export_dir, "export-checkpoint.json")
+        )
+        progress = checkpoint.get("comments")
+        checkpoint.save(
+            "comments", last_pk=progress["last_pk"] - 4,
+            offset=expected.index(b"\n", 1) + 1,
+        )
+        with open(path, "ab") as comments:
+            comments.write(b'{"broken')
+        self.export(batch_size=2, resume=True)
+        with open(path, "rb") as comments:
+            self.assertEqual(comments.read(), expected)
+
+    def test_import_resume_is_idempotent(self):
+        self.export()
+        self.wipe()
+        self.load(batch_size=2)
+        checkpoint = Checkpoint(
+            os.path.join(self.export_dir, "import-checkpoint.json")
+        )
+        checkpoint.save("comments", offset=0)
+        out = self.load(batch_size=2, resume=True)
+        self.assertIn("comments: 0, пропущено 5", out)
+        self.assertEqual(Comment.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_import_refuses_database_with_posts(self):
+        self.export()
+        with self.assertRaises(CommandError):
+            self.load()
+        self.assertEqual(Comment.objects.count(), 5)
+
+    def test_import_reports_skipped_rows(self):
+        self.export()
+        self.wipe()
+        # Комментарий к записи, которой нет в выгрузке.
+        with open(
+            os.path.join(self.export_dir, "comments.jsonl"), "a"
+        ) as comments:
+            comments.write(json.dumps({
+                "id": 1000, "text": "Сирота", "post": 1000,
+                "author": "reader", "created": "2020-01-01T00:00:00Z",
+            }) + "\n")
+        out = self.load()
+        self.assertIn("comments: 5, пропущено 1", out)
+        self.assertIn("users: 2, пропущено 0", out)
+        self.assertFalse(Comment.objects.filter(pk=1000).exists())
+        reader = User.objects.get(username="reader")
+        self.assertFalse(reader.has_usable_password())
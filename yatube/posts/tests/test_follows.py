@@ -0,0 +1,167 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from .. import follows
+from ..models import AuthorStats, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class FollowServiceTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username="reader")
+        cls.authors = [
+            User.objects.create_user(username=f"author{i}") for i in range(3)
+        ]
+        cls.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        for author in cls.authors:
+            Post.objects.create(text="Запись", author=author, group=cls.group)
+        Post.objects.create(text="Вне группы", author=cls.authors[0])
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_follow_is_idempotent(self):
+        author = FollowServiceTests.authors[0]
+        self.assertEqual(follows.follow(self.reader.pk, [author.pk]), 1)
+        self.assertEqual(follows.follow(self.reader.pk, [author.pk]), 0)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(self.stats(author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+
+    def test_cannot_follow_self(self):
+        self.assertEqual(follows.follow(self.reader.pk, [self.reader.pk]), 0)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_follow_group_authors(self):
+        self.assertEqual(follows.follow_group(self.reader.pk, self.group), 3)
+        self.assertEqual(self.stats(self.reader).following_count, 3)
+        for author in self.authors:
+            with self.subTest(author=author.username):
+                self.assertEqual(self.stats(author).followers_count, 1)
+
+    def test_unfollow_many(self):
+        follows.follow_group(self.reader.pk, self.group)
+        removed = follows.unfollow(
+            self.reader.pk,
+            author_id__in=[author.pk for author in self.authors[:2]]
+        )
+        self.assertEqual(removed, 2)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(self.authors[0]).followers_count, 0)
+        self.assertEqual(
+            follows.unfollow(self.reader.pk, author__username="author0"), 0
+        )
+
+    def test_save_and_bulk_follow_share_side_effects(self):
+        first, second = self.authors[:2]
+        with mock.patch.object(follows, "followed") as followed:
+            Follow.objects.create(user=self.reader, author=first)
+            follows.follow(self.reader.pk, [second.pk])
+        followed.assert_has_calls([
+            mock.call(self.reader.pk, [first.pk]),
+            mock.call(self.reader.pk, {second.pk}),
+        ])
+        with mock.patch.object(follows, "unfollowed") as unfollowed:
+            follows.unfollow(self.reader.pk, author_id=first.pk)
+        unfollowed.assert_called_once_with(self.reader.pk, [first.pk])
+
+    def test_group_follow_view(self):
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse("group_follow", args=["group"]))
+        self.assertRedirects(response, reverse("group_slug", args=["group"]))
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 3
+        )
+
+
+class FollowRaceTests(TransactionTestCase):
+    threads = 8
+
+    def setUp(self):
+        self.readers = [
+            User.objects.create_user(username=f"reader{i}")
+            for i in range(self.threads)
+        ]
+        self.author = User.objects.create_user(username="author")
+        Post.objects.create(text="Запись", author=self.author)
+
+    def race(self, action):
+        """Запускает ``action`` во всех потоках одновременно."""
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def worker(i):
+            try:
+                barrier.wait()
+                action(i)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=worker, args=(i,))
+            for i in range(self.threads)
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def counter(self, user, field):
+        # Строки статистики нет у тех, кто ни на кого не подписывался.
+        return AuthorStats.objects.filter(user=user).values_list(
+            field, flat=True
+        ).first() or 0
+
+    def assertConsistent(self):
+        self.assertEqual(
+            self.counter(self.author, "followers_count"),
+            Follow.objects.filter(author=self.author).count()
+        )
+        for reader in self.readers:
+            following = Follow.objects.filter(user=reader).count()
+            self.assertEqual(
+                self.counter(reader, "following_count"), following
+            )
+            self.assertEqual(
+                TimelineEntry.objects.filter(user=reader).count(), following
+            )
+
+    def test_concurrent_clicks_of_one_reader(self):
+        reader = self.readers[0]
+        self.race(lambda i: follows.follow(reader.pk, [self.author.pk]))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertConsistent()
+        self.race(lambda i: follows.unfollow(
+            reader.pk, author__username="author"
+        ))
+        self.assertFalse(Follow.objects.exists())
+        self.assertConsistent()
+
+    def test_concurrent_readers(self):
+        self.race(lambda i: follows.follow(
+            self.readers[i].pk, [self.author.pk]
+        ))
+        self.assertEqual(Follow.objects.count(), self.threads)
+        self.assertConsistent()
+        self.race(lambda i: i % 2 and follows.unfollow(
+            self.readers[i].pk, author_id=self.author.pk
+        ))
+        self.assertEqual(Follow.objects.count(), self.threads // 2)
+        self.assertConsistent()
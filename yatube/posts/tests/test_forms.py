@@ -1,14 +1,18 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client, TestCase, TransactionTestCase
+from django.test import override_settings
 from django.urls import reverse
+from PIL import Image
 
-from ..models import Group, Post
+from ..forms import PostForm
+from ..models import Comment, Group, Post
 
 User = get_user_model()
 
@@ -90,3 +94,206 @@ class PostFormTests(TestCase):
                 "post_id": f"{PostFormTests.post.id}"})
         )
         self.assertEqual(Post.objects.count(), post_count)
+
+    def test_edit_keeps_counters_written_meanwhile(self):
+        post = Post.objects.get(pk=PostFormTests.post.pk)
+        form = PostForm({"text": "Правка"}, instance=post)
+        self.assertTrue(form.is_valid())
+        # Пока автор правил запись, её прокомментировали и обработали.
+        Comment.objects.create(
+            post=post, author=PostFormTests.testuser, text="Ответ"
+        )
+        Post.objects.filter(pk=post.pk).update(thumbnail_url="/thumb.jpg")
+        form.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text, "Правка")
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(post.thumbnail_url, "/thumb.jpg")
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class ThumbnailTests(TransactionTestCase):
+    small_gif = (
+        b"\x47\x49\x46\x38\x39\x61\x02\x00"
+        b"\x01\x00\x80\x00\x00\x00\x00\x00"
+        b"\xFF\xFF\xFF\x21\xF9\x04\x00\x00"
+        b"\x00\x00\x00\x2C\x00\x00\x00\x00"
+        b"\x02\x00\x01\x00\x00\x02\x02\x0C"
+        b"\x0A\x00\x3B"
+    )
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.testuser = User.objects.create_user(
+            username="testuser", password="123"
+        )
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.testuser)
+        cache.clear()
+
+    def upload(self, name, color=None):
+        content = self.small_gif
+        if color is not None:
+            buffer = BytesIO()
+            Image.new("RGB", (2, 1), color).save(buffer, "GIF")
+            content = buffer.getvalue()
+        return SimpleUploadedFile(
+            name=name, content=content, content_type="image/gif"
+        )
+
+    def test_new_post_gets_thumbnail(self):
+        self.authorized_client.post(
+            reverse("new_post"),
+            data={"text": "С картинкой", "image": self.upload("small.gif")}
+        )
+        post = Post.objects.get()
+        self.assertTrue(post.thumbnail_url)
+        self.assertEqual(post.thumbnail_width, 960)
+        self.assertEqual(post.thumbnail_height, 339)
+        response = self.authorized_client.get(reverse("index"))
+        self.assertContains(response, post.thumbnail_url)
+
+    def test_thumbnail_variants_for_srcset(self):
+        self.authorized_client.post(
+            reverse("new_post"),
+            data={"text": "С картинкой", "image": self.upload("small.gif")}
+        )
+        post = Post.objects.get()
+        widths = [
+            candidate.rsplit(" ", 1)[1]
+            for candidate in post.thumbnail_srcset.split(", ")
+        ]
+        self.assertEqual(widths, ["320w", "640w", "960w"])
+        self.assertTrue(post.thumbnail_srcset.endswith(
+            f"{post.thumbnail_url} 960w"
+        ))
+
+    def test_only_first_feed_image_loads_eagerly(self):
+        for color in ("red", "blue"):
+            self.authorized_client.post(reverse("new_post"), data={
+                "text": "С картинкой",
+                "image": self.upload(f"{color}.gif", color)
+            })
+        response = self.authorized_client.get(reverse("index"))
+        first, second = Post.objects.order_by("-pub_date")
+        self.assertContains(response, f'srcset="{first.thumbnail_srcset}"')
+        self.assertContains(response, 'loading="eager"', count=1)
+        self.assertContains(response, 'loading="lazy"', count=1)
+        self.assertContains(response, 'sizes="(max-width: 960px)', count=2)
+
+    def test_new_image_replaces_thumbnail(self):
+        self.authorized_client.post(
+            reverse("new_post"),
+            data={"text": "С картинкой", "image": self.upload("first.gif")}
+        )
+        post = Post.objects.get()
+        first_thumbnail = post.thumbnail_url
+        self.authorized_client.post(
+            reverse("post_edit", args=[self.testuser.username, post.pk]),
+            data={
+                "text": "С картинкой",
+                "image": self.upload("second.gif", "blue")
+            }
+        )
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail_url)
+        self.assertNotEqual(post.thumbnail_url, first_thumbnail)
+
+    def test_post_without_image_has_no_thumbnail(self):
+        self.authorized_client.post(
+            reverse("new_post"), data={"text": "Без картинки"}
+        )
+        self.assertEqual(Post.objects.get().thumbnail_url, "")
+
+
+@override_settings(THUMBNAIL_WORKERS=0, POST_IMAGE_MAX_SIDE=400)
+class ImageUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.testuser = User.objects.create_user(username="testuser")
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.testuser)
+        cache.clear()
+
+    def photo(self, size=(1200, 600)):
+        # Снимок с телефона: JPEG, повёрнутый тегом EXIF на 90°.
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = "Камера"
+        buffer = BytesIO()
+        Image.new("RGB", size, "red").save(buffer, "JPEG", exif=exif)
+        return SimpleUploadedFile(
+            "photo.jpg", buffer.getvalue(), content_type="image/jpeg"
+        )
+
+    def publish(self, image):
+        return self.authorized_client.post(
+            reverse("new_post"), data={"text": "Снимок", "image": image}
+        )
+
+    def test_photo_is_reencoded(self):
+        self.publish(self.photo())
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.endswith(".webp"))
+        self.assertEqual((post.image_width, post.image_height), (200, 400))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, "WEBP")
+            self.assertEqual(image.size, (200, 400))
+            self.assertNotIn("exif", image.info)
+
+    def test_edit_without_new_image_keeps_dimensions(self):
+        self.publish(self.photo())
+        post = Post.objects.get()
+        self.authorized_client.post(
+            reverse("post_edit", args=[self.testuser.username, post.pk]),
+            data={"text": "Новый текст"}
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.text, "Новый текст")
+        self.assertEqual((post.image_width, post.image_height), (200, 400))
+
+    def test_upload_still_checks_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.testuser)
+        response = client.post(
+            reverse("new_post"), {"text": "Снимок", "image": self.photo()}
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Post.objects.exists())
+
+    def test_admin_upload_is_reencoded(self):
+        admin = User.objects.create_superuser(
+            "admin", "admin@example.com", "123"
+        )
+        self.authorized_client.force_login(admin)
+        self.authorized_client.post(reverse("admin:posts_post_add"), {
+            "text": "Снимок", "author": self.testuser.pk,
+            "image": self.photo(),
+        })
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.endswith(".webp"))
+        self.assertEqual((post.image_width, post.image_height), (200, 400))
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_too_many_pixels(self):
+        response = self.publish(self.photo())
+        self.assertFormError(
+            response, "form", "image", "Слишком большое изображение."
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_BYTES=1024)
+    def test_too_many_bytes(self):
+        response = self.publish(self.photo())
+        self.assertFormError(
+            response, "form", "image", "Файл больше 1,0\xa0КБ."
+        )
+        self.assertFalse(Post.objects.exists())
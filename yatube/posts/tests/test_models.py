@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import AuthorStats, Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -48,3 +48,92 @@ class GroupModelTest(TestCase):
         group = GroupModelTest.group
         expected_object_name = group.title
         self.assertEqual(str(group), expected_object_name)
+
+
+class AuthorStatsModelTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username="author", password="123"
+        )
+        cls.reader = User.objects.create_user(
+            username="reader", password="123"
+        )
+
+    def assertStats(self, user, **expected):
+        stats = AuthorStats.objects.for_author(user)
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_post_count_follows_posts(self):
+        post = Post.objects.create(text="Тест", author=self.author)
+        Post.objects.create(text="Тест", author=self.author)
+        self.assertStats(self.author, posts_count=2)
+        post.delete()
+        self.assertStats(self.author, posts_count=1)
+
+    def test_follow_counters_follow_subscriptions(self):
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertStats(self.author, followers_count=1, following_count=0)
+        self.assertStats(self.reader, followers_count=0, following_count=1)
+        follow.delete()
+        self.assertStats(self.author, followers_count=0)
+        self.assertStats(self.reader, following_count=0)
+
+    def test_stats_created_from_existing_rows(self):
+        Post.objects.create(text="Тест", author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.all().delete()
+        self.assertStats(
+            self.author, posts_count=1, followers_count=1, following_count=0
+        )
+
+    def test_cascade_delete_updates_counters(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertStats(self.author, followers_count=1)
+        User.objects.filter(pk=self.reader.pk).delete()
+        self.assertStats(self.author, followers_count=0)
+
+    def test_counters_do_not_go_below_zero(self):
+        # Строка статистики могла появиться раньше записей автора.
+        post = Post.objects.create(text="Тест", author=self.author)
+        AuthorStats.objects.filter(user=self.author).update(posts_count=0)
+        post.delete()
+        self.assertStats(self.author, posts_count=0)
+
+
+class CommentCountModelTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username="author", password="123"
+        )
+        cls.post = Post.objects.create(text="Тест", author=cls.author)
+
+    def comment_count(self):
+        return Post.objects.get(pk=self.post.pk).comment_count
+
+    def test_comment_count_follows_comments(self):
+        comment = Comment.objects.create(
+            post=self.post, author=self.author, text="Ответ"
+        )
+        Comment.objects.create(
+            post=self.post, author=self.author, text="Ответ"
+        )
+        self.assertEqual(self.comment_count(), 2)
+        comment.delete()
+        self.assertEqual(self.comment_count(), 1)
+
+    def test_cascade_delete_updates_comment_count(self):
+        commenter = User.objects.create_user(
+            username="commenter", password="123"
+        )
+        Comment.objects.create(
+            post=self.post, author=commenter, text="Ответ"
+        )
+        self.assertEqual(self.comment_count(), 1)
+        commenter.delete()
+        self.assertEqual(self.comment_count(), 0)
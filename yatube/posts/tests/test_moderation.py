@@ -0,0 +1,183 @@
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import moderation, workers
+from ..models import AuthorStats, Comment, Group, ModerationJob, Post
+
+User = get_user_model()
+
+
+@override_settings(MODERATION_WORKERS=0)
+class ModerationJobTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="pass"
+        )
+        self.author = User.objects.create_user(username="author")
+        self.spammer = User.objects.create_user(username="spammer")
+        self.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        self.client = Client()
+        self.client.force_login(self.admin)
+        # Маленькие части, чтобы каждая задача шла в несколько заходов.
+        chunks = mock.patch.object(moderation, "CHUNK_SIZE", 2)
+        chunks.start()
+        self.addCleanup(chunks.stop)
+
+    def run_action(self, model, action, selected, query="", **data):
+        url = reverse(f"admin:posts_{model}_changelist") + query
+        return self.client.post(url, {
+            "action": action, "index": 0,
+            "_selected_action": [obj.pk for obj in selected], **data,
+        }, follow=True)
+
+    def assertJobDone(self, total):
+        job = ModerationJob.objects.get()
+        self.assertEqual(job.status, ModerationJob.DONE)
+        self.assertEqual((job.done, job.total), (total, total))
+        self.assertEqual(job.created_by, self.admin)
+        self.assertIsNotNone(job.finished)
+
+    def test_delete_authors_content(self):
+        post = Post.objects.create(text="Запись", author=self.author)
+        spam = [
+            Post.objects.create(text=f"Спам {i}", author=self.spammer)
+            for i in range(5)
+        ]
+        for i in range(3):
+            Comment.objects.create(post=post, author=self.spammer, text="Спам")
+        Comment.objects.create(post=spam[0], author=self.author, text="Ответ")
+        response = self.run_action(
+            "comment", "delete_authors_content",
+            Comment.objects.filter(author=self.spammer)[:1],
+        )
+        self.assertContains(response, "поставлена в очередь")
+        self.assertJobDone(total=8)
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+        self.assertFalse(Comment.objects.exclude(post=post).exists())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.spammer).posts_count, 0
+        )
+
+    def test_move_to_group(self):
+        other = Group.objects.create(
+            title="Другая", slug="other", description="Описание"
+        )
+        posts = [
+            Post.objects.create(text=f"Запись {i}", author=self.author)
+            for i in range(4)
+        ]
+        posts.append(Post.objects.create(
+            text="Уже в группе", author=self.author, group=self.group
+        ))
+        Post.objects.create(text="Остаётся", author=self.author, group=other)
+        guest = Client()
+        guest.get(reverse("group_slug", args=["group"]))
+        self.run_action(
+            "post", "move_to_group", posts, group=self.group.pk
+        )
+        self.assertJobDone(total=5)
+        self.assertEqual(Post.objects.filter(group=self.group).count(), 5)
+        self.assertEqual(Post.objects.filter(group=other).count(), 1)
+        # Закешированная для гостей страница группы сброшена.
+        self.assertContains(
+            guest.get(reverse("group_slug", args=["group"])), "Запись 3"
+        )
+
+    def test_move_requires_group(self):
+        post = Post.objects.create(text="Запись", author=self.author)
+        response = self.run_action("post", "move_to_group", [post])
+        self.assertContains(response, "Выберите группу")
+        self.assertFalse(ModerationJob.objects.exists())
+
+    def test_purge_filtered(self):
+        # Как и поиск админки, в SQLite регистр не учитывается лишь у
+        # латиницы.
+        for text in ("купить казино", "Казино: купить дёшево", "Просто так"):
+            Post.objects.create(text=text, author=self.author)
+        old = Post.objects.create(text="купить в 2019", author=self.author)
+        Post.objects.filter(pk=old.pk).update(
+            pub_date=timezone.make_aware(datetime(2019, 3, 5))
+        )
+        selected = Post.objects.filter(text="купить казино")
+        response = self.run_action(
+            "post", "purge_filtered", selected,
+            query=f"?q=купить&pub_date__year={timezone.now().year}",
+        )
+        self.assertContains(response, "поставлена в очередь")
+        self.assertJobDone(total=2)
+        self.assertQuerysetEqual(
+            Post.objects.order_by("pk"), ["Просто так", "купить в 2019"],
+            transform=str,
+        )
+        response = self.run_action("post", "purge_filtered", [
+            Post.objects.first()
+        ])
+        self.assertContains(response, "Сначала отберите записи")
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_failed_job_is_reported(self):
+        moderation.move_to_group([1], group_id=404)
+        job = ModerationJob.objects.get()
+        self.assertEqual(job.status, ModerationJob.FAILED)
+        self.assertIn("does not exist", job.error)
+
+    def test_command_resumes_interrupted_jobs(self):
+        for i in range(3):
+            Post.objects.create(text=f"Спам {i}", author=self.spammer)
+        with override_settings(MODERATION_WORKERS=1), mock.patch.object(
+            workers, "get_executor"
+        ):
+            moderation.delete_by_authors([self.spammer.pk], self.admin)
+        # Процесс, взявший задачу, отмечался недавно: её не трогаем.
+        ModerationJob.objects.update(
+            status=ModerationJob.RUNNING, heartbeat=timezone.now()
+        )
+        call_command("run_moderation_jobs", stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 3)
+        # Отметок не было дольше аренды: задачу продолжает команда.
+        ModerationJob.objects.update(heartbeat=timezone.now() - timedelta(
+            seconds=settings.MODERATION_JOB_LEASE + 1
+        ))
+        call_command("run_moderation_jobs", stdout=StringIO())
+        self.assertJobDone(total=3)
+        self.assertFalse(Post.objects.exists())
+
+    def test_worker_stops_when_lease_is_taken(self):
+        for i in range(3):
+            Post.objects.create(text=f"Спам {i}", author=self.spammer)
+
+        def delete_by_authors(job, author_ids):
+            # Пока шла первая часть, задачу забрал другой процесс.
+            ModerationJob.objects.update(heartbeat=timezone.now())
+            moderation._advance(job, 1)
+        with mock.patch.dict(moderation.RUNNERS, {
+            ModerationJob.DELETE_BY_AUTHORS: delete_by_authors
+        }):
+            moderation.delete_by_authors([self.spammer.pk], self.admin)
+        job = ModerationJob.objects.get()
+        self.assertEqual(job.status, ModerationJob.RUNNING)
+        self.assertEqual(job.done, 0)
+        self.assertIsNone(job.finished)
+
+    def test_jobs_admin_shows_progress(self):
+        ModerationJob.objects.create(
+            action=ModerationJob.PURGE_POSTS, params="{}", total=200, done=50
+        )
+        response = self.client.get(
+            reverse("admin:posts_moderationjob_changelist")
+        )
+        self.assertContains(response, "50 из 200 (25%)")
@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import MediaBlob, Post
+from ..storage import post_image_storage
+
+User = get_user_model()
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTests(TransactionTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.author = User.objects.create_user(username="author")
+        self.client = Client()
+        self.client.force_login(self.author)
+        cache.clear()
+
+    def meme(self, name="meme.png", color="red"):
+        buffer = BytesIO()
+        Image.new("RGB", (40, 30), color).save(buffer, "PNG")
+        return SimpleUploadedFile(
+            name, buffer.getvalue(), content_type="image/png"
+        )
+
+    def publish(self, image):
+        self.client.post(
+            reverse("new_post"), data={"text": "Мем", "image": image}
+        )
+        return Post.objects.latest("pk")
+
+    def exists(self, url):
+        name = url[len(settings.MEDIA_URL):]
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def blob_refs(self, name):
+        return MediaBlob.objects.filter(name=name).values_list(
+            "refs", flat=True
+        ).first()
+
+    def test_same_content_is_stored_once(self):
+        first = self.publish(self.meme("first.png"))
+        second = self.publish(self.meme("second.png"))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r"^posts/([0-9a-f]{2})/([0-9a-f]{2})/\1\2"
+            r"[0-9a-f]{60}\.webp$"
+        )
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(len(os.listdir(directory)), 1)
+        self.assertEqual(self.blob_refs(first.image.name), 2)
+        self.assertEqual(second.thumbnail_url, first.thumbnail_url)
+
+    def test_file_is_deleted_with_last_reference(self):
+        first = self.publish(self.meme())
+        second = self.publish(self.meme())
+        path = first.image.path
+        thumbnail_url = first.thumbnail_url
+        self.assertTrue(self.exists(thumbnail_url))
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(self.blob_refs(second.image.name), 1)
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(self.exists(thumbnail_url))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_replaced_image_is_released(self):
+        post = self.publish(self.meme())
+        old_path = post.image.path
+        edit_url = reverse("post_edit", args=["author", post.pk])
+        self.client.post(edit_url, data={
+            "text": "Тот же мем", "image": self.meme()
+        })
+        post.refresh_from_db()
+        self.assertEqual(self.blob_refs(post.image.name), 1)
+        self.client.post(edit_url, data={
+            "text": "Другой мем", "image": self.meme(color="blue")
+        })
+        post.refresh_from_db()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(post.image.path))
+        self.assertEqual(MediaBlob.objects.count(), 1)
+
+    def test_untracked_files_are_kept(self):
+        # Файл, на который никто не брал ссылку, release не трогает.
+        path = post_image_storage.path("posts/legacy.png")
+        os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as legacy_file:
+            legacy_file.write(self.meme().read())
+        legacy = Post.objects.create(
+            text="Старая запись", author=self.author, image="posts/legacy.png"
+        )
+        legacy.delete()
+        self.assertTrue(os.path.exists(path))
+
+    def test_imported_image_survives_identical_upload(self):
+        name = self.publish(self.meme()).image.name
+        export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_dir, ignore_errors=True)
+        call_command("posts_export", export_dir, stdout=StringIO())
+        User.objects.all().delete()
+        call_command(
+            "posts_import", export_dir, skip_derived=True, stdout=StringIO()
+        )
+        imported = Post.objects.get()
+        self.assertEqual(imported.image.name, name)
+        self.assertEqual(self.blob_refs(name), 1)
+        self.client.force_login(User.objects.get(username="author"))
+        uploaded = self.publish(self.meme())
+        self.assertEqual(uploaded.image.name, name)
+        uploaded.delete()
+        self.assertTrue(os.path.exists(imported.image.path))
+        self.assertEqual(self.blob_refs(name), 1)
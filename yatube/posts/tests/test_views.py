@@ -1,15 +1,23 @@
 import shutil
 import tempfile
+import time
+from datetime import timedelta
+from unittest import skipUnless
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+from ..paginators import encode_cursor
+from ..search import PostgresSearchBackend, SearchBackend
+from ..views import COMMENTS_ON_PAGE, ENTRIES_ON_PAGE
 
 User = get_user_model()
 
@@ -157,7 +165,24 @@ class PostPagesTests(TestCase):
         self.assertEqual(len(response.context["page"]), 0)
 
     def test_cache_index(self):
+        self.authorized_client.get(reverse("index"))
+        Post.objects.filter(pk=PostPagesTests.post.pk).update(
+            text="Изменено в обход сигналов"
+        )
+        response = self.authorized_client.get(reverse("index"))
+        self.assertNotContains(response, "Изменено в обход сигналов")
+        cache.clear()
         response = self.authorized_client.get(reverse("index"))
+        self.assertContains(response, "Изменено в обход сигналов")
+
+    def test_cached_index_does_not_read_posts(self):
+        self.authorized_client.get(reverse("index"))
+        # Остаются только сессия и пользователь.
+        with self.assertNumQueries(2):
+            self.authorized_client.get(reverse("index"))
+
+    def test_new_post_invalidates_index_cache(self):
+        self.authorized_client.get(reverse("index"))
         form_data_for_cache = {
             "text": "Проверка кэша",
         }
@@ -167,9 +192,6 @@ class PostPagesTests(TestCase):
             follow=True
         )
         response = self.authorized_client.get(reverse("index"))
-        self.assertNotContains(response, "Проверка кэша")
-        cache.clear()
-        response = self.authorized_client.get(reverse("index"))
         self.assertContains(response, "Проверка кэша")
 
 
@@ -194,12 +216,17 @@ class PaginatorViewsTest(TestCase):
         ]
         Post.objects.bulk_create(post_list)
 
+    def setUp(self):
+        cache.clear()
+
     def test_index_first_page_contains_ten_records(self):
         response = self.client.get(reverse("index"))
         self.assertEqual(len(response.context.get("page").object_list), 10)
 
     def test_index_second_page_contains_three_records(self):
-        response = self.client.get(reverse("index") + "?page=2")
+        response = self.client.get(reverse("index"))
+        cursor = response.context.get("page").next_cursor
+        response = self.client.get(reverse("index") + f"?after={cursor}")
         self.assertEqual(len(response.context.get("page").object_list), 5)
 
     def test_group_first_page_contains_twelve_records(self):
@@ -210,11 +237,63 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context.get("page").object_list), 10)
 
     def test_group_second_page_contains_three_records(self):
-        response = self.client.get(
-            reverse("group_slug", kwargs={
-                "slug": f"{PaginatorViewsTest.group.slug}"}) + "?page=2")
+        url = reverse("group_slug", kwargs={
+            "slug": f"{PaginatorViewsTest.group.slug}"})
+        response = self.client.get(url)
+        cursor = response.context.get("page").next_cursor
+        response = self.client.get(url + f"?after={cursor}")
         self.assertEqual(len(response.context.get("page").object_list), 5)
 
+    def test_previous_page_returns_first_page(self):
+        response = self.client.get(reverse("index"))
+        first_page = list(response.context.get("page").object_list)
+        cursor = response.context.get("page").next_cursor
+        response = self.client.get(reverse("index") + f"?after={cursor}")
+        cursor = response.context.get("page").previous_cursor
+        response = self.client.get(reverse("index") + f"?before={cursor}")
+        page = response.context.get("page")
+        self.assertEqual(list(page.object_list), first_page)
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+
+    def test_pages_do_not_overlap(self):
+        response = self.client.get(reverse("index"))
+        first_page = set(response.context.get("page").object_list)
+        cursor = response.context.get("page").next_cursor
+        response = self.client.get(reverse("index") + f"?after={cursor}")
+        second_page = set(response.context.get("page").object_list)
+        self.assertFalse(first_page & second_page)
+        self.assertEqual(len(first_page | second_page), 15)
+
+    def test_index_cache_is_page_aware(self):
+        response = self.client.get(reverse("index"))
+        cursor = response.context.get("page").next_cursor
+        response = self.client.get(reverse("index") + f"?after={cursor}")
+        for post in response.context.get("page"):
+            self.assertContains(response, f'name="post_{post.id}"')
+        self.assertContains(response, 'name="post_', count=5)
+
+    def test_feed_does_not_count_posts(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("index"))
+        for query in queries:
+            self.assertNotIn("COUNT(", query["sql"].upper())
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(reverse("index") + "?after=broken")
+        self.assertEqual(len(response.context.get("page").object_list), 10)
+
+    def test_empty_before_page_returns_first_page(self):
+        newest = Post.objects.latest("pub_date", "pk")
+        newest.pub_date += timedelta(days=1)
+        cursor = encode_cursor(newest)
+        response = self.client.get(reverse("index") + f"?before={cursor}")
+        page = response.context.get("page")
+        self.assertEqual(len(page.object_list), 10)
+        self.assertFalse(page.has_previous())
+        self.assertIsNotNone(page.next_cursor)
+        self.assertNotContains(response, "=None")
+
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class ProfilePagesTests(TestCase):
@@ -413,3 +492,607 @@ class FollowCommentTests(TestCase):
             f"{FollowCommentTests.post.id}/"
         )
         self.assertNotContains(response, "Комментарий гостя")
+
+
+class FeedQueryCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title="Тест",
+            slug="Test",
+            description="Тестовое описание"
+        )
+        cls.reader = User.objects.create_user(
+            username="reader", password="123"
+        )
+        for i in range(10):
+            author = User.objects.create_user(
+                username=f"author{i}", password="123"
+            )
+            Follow.objects.create(user=cls.reader, author=author)
+            post = Post.objects.create(
+                text=f"Тест {i}", author=author, group=cls.group
+            )
+            for j in range(3):
+                Comment.objects.create(
+                    post=post, author=cls.reader, text=f"Ответ {j}"
+                )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(FeedQueryCountTests.reader)
+        cache.clear()
+
+    def test_feed_pages_query_budget(self):
+        urls = {
+            reverse("index"): 1,
+            reverse("group_slug", args=[FeedQueryCountTests.group.slug]): 2,
+            reverse("follow_index"): 2,
+        }
+        for url, view_queries in urls.items():
+            with self.subTest(url=url):
+                # Сессия и пользователь + запросы самой страницы.
+                with self.assertNumQueries(2 + view_queries):
+                    response = self.reader_client.get(url)
+                self.assertEqual(len(response.context["page"]), 10)
+
+    def test_feed_shows_comment_count(self):
+        response = self.reader_client.get(reverse("index"))
+        self.assertContains(response, "Комментариев: 3", count=10)
+
+    def test_feed_does_not_touch_comments(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(reverse("index"))
+        for query in queries:
+            self.assertNotIn("posts_comment", query["sql"])
+
+
+class FollowTimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(
+            username="reader", password="123"
+        )
+        cls.author = User.objects.create_user(
+            username="author", password="123"
+        )
+        cls.old_post = Post.objects.create(
+            text="Старый пост", author=cls.author
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(FollowTimelineTests.reader)
+
+    def follow_page(self):
+        response = self.reader_client.get(reverse("follow_index"))
+        return list(response.context["page"])
+
+    def test_follow_backfills_timeline(self):
+        self.reader_client.get(
+            reverse("profile_follow", args=[self.author.username])
+        )
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post
+        ).exists())
+        self.assertEqual(self.follow_page(), [self.old_post])
+
+    def test_new_post_is_fanned_out(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text="Новый пост", author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post
+        ).exists())
+        self.assertEqual(self.follow_page(), [post, self.old_post])
+
+    def test_unfollow_trims_timeline(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(
+            reverse("profile_unfollow", args=[self.author.username])
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+        self.assertEqual(self.follow_page(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_heavy_author_is_read_on_demand(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text="Новый пост", author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+        self.assertEqual(self.follow_page(), [post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_crossing_fanout_limit_rebuilds_timelines(self):
+        other = User.objects.create_user(username="other")
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+        # Автор перешёл порог: его записи уходят из лент.
+        follow = Follow.objects.create(user=other, author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        post = Post.objects.create(text="Без раскладки", author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.follow_page(), [post, self.old_post])
+        # Вернулся под порог: ленты собраны заново, с пропущенной записью.
+        follow.delete()
+        self.assertQuerysetEqual(
+            TimelineEntry.objects.filter(user=self.reader).order_by("pk"),
+            [self.old_post.pk, post.pk],
+            transform=lambda entry: entry.post_id, ordered=False
+        )
+        self.assertEqual(self.follow_page(), [post, self.old_post])
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(
+            username="reader", password="123"
+        )
+        cls.author = User.objects.create_user(
+            username="author", password="123"
+        )
+        cls.group = Group.objects.create(
+            title="Тест",
+            slug="Test",
+            description="Тестовое описание"
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(15):
+            cls.post = Post.objects.create(
+                text=f"Тест {i}", author=cls.author, group=cls.group
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f"Ответ {i}"
+            )
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f"Ещё {i}")
+            for i in range(COMMENTS_ON_PAGE)
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(QueryPlanTests.reader)
+        cache.clear()
+
+    def query_plans(self, url):
+        # Иначе лента придёт из кеша фрагментов без запроса к записям.
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with connection.cursor() as cursor:
+            for query in queries:
+                if not query["sql"].startswith("SELECT"):
+                    continue
+                cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+                plan = [row[-1] for row in cursor.fetchall()]
+                yield query["sql"], plan
+
+    def test_views_use_indexes(self):
+        index = reverse("index")
+        author = QueryPlanTests.author.username
+        urls = (
+            index,
+            reverse("group_slug", args=[QueryPlanTests.group.slug]),
+            reverse("profile", args=[author]),
+            reverse("post_view", args=[author, QueryPlanTests.post.pk]),
+            reverse("follow_index"),
+        )
+        for url in urls:
+            context = self.reader_client.get(url).context
+            cursor = context.get("page") or context.get("comments")
+            pages = [url]
+            if cursor is not None:
+                pages.append(f"{url}?after={cursor.next_cursor}")
+            for page in pages:
+                for sql, plan in self.query_plans(page):
+                    for step in plan:
+                        with self.subTest(url=page, sql=sql, step=step):
+                            self.assertNotIn("TEMP B-TREE", step)
+                            if step.startswith("SCAN"):
+                                self.assertIn("INDEX", step)
+
+    def test_feeds_seek_by_date_index(self):
+        author = QueryPlanTests.author.username
+        feeds = {
+            reverse("index"): r"post_date_idx \(pub_date<\?\)",
+            reverse("group_slug", args=[QueryPlanTests.group.slug]):
+                r"post_group_date_idx \(group_id=\? AND pub_date<\?\)",
+            reverse("profile", args=[author]):
+                r"post_author_date_idx \(author_id=\? AND pub_date<\?\)",
+        }
+        for url, index in feeds.items():
+            cursor = self.reader_client.get(url).context.get("page")
+            page = f"{url}?after={cursor.next_cursor}"
+            steps = "\n".join(
+                step for _, plan in self.query_plans(page) for step in plan
+            )
+            with self.subTest(url=page):
+                # Страница после курсора читается с места курсора в индексе.
+                self.assertRegex(
+                    steps, rf"(?m)^SEARCH (TABLE )?posts_post USING INDEX "
+                    rf"{index}$"
+                )
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username="author", password="123"
+        )
+        cls.post = Post.objects.create(
+            text="Прогулка по осеннему парку", author=cls.author
+        )
+        cls.other_post = Post.objects.create(
+            text="Рецепт пирога", author=cls.author
+        )
+        Comment.objects.create(
+            post=cls.other_post, author=cls.author, text="Вкусный пирог"
+        )
+
+    def search(self, query, **params):
+        response = self.client.get(reverse("search"), {"q": query, **params})
+        return list(response.context["page"])
+
+    def test_search_finds_posts_by_text(self):
+        self.assertEqual(self.search("ПАРКУ"), [self.post])
+
+    def test_search_finds_posts_by_comments(self):
+        self.assertEqual(self.search("вкусный"), [self.other_post])
+
+    def test_search_ranks_results(self):
+        best = Post.objects.create(
+            text="Пирога много: пирога хватит всем", author=self.author
+        )
+        self.assertEqual(self.search("пирога")[0], best)
+
+    def test_search_follows_edits_and_deletes(self):
+        post = Post.objects.create(text="Черновик", author=self.author)
+        post.text = "Чистовик"
+        post.save()
+        self.assertEqual(self.search("черновик"), [])
+        self.assertEqual(self.search("чистовик"), [post])
+        post.delete()
+        self.assertEqual(self.search("чистовик"), [])
+
+    def test_search_ignores_query_syntax(self):
+        for query in ('"парку', "парку AND", "NEAR(", "*"):
+            with self.subTest(query=query):
+                response = self.client.get(reverse("search"), {"q": query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_search_is_paginated(self):
+        for i in range(ENTRIES_ON_PAGE + 2):
+            Post.objects.create(text=f"Пирога кусок {i}", author=self.author)
+        self.assertEqual(len(self.search("кусок")), ENTRIES_ON_PAGE)
+        self.assertEqual(len(self.search("кусок", page=2)), 2)
+
+    def test_empty_query_shows_form(self):
+        response = self.client.get(reverse("search"))
+        self.assertIsNone(response.context["page"])
+
+
+@skipUnless(connection.vendor == "postgresql", "нужен PostgreSQL")
+@override_settings(SEARCH_BACKEND="posts.search.PostgresSearchBackend")
+class PostgresSearchBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.post = Post.objects.create(
+            text="Прогулка по осеннему парку", author=cls.author
+        )
+        cls.other_post = Post.objects.create(
+            text="Рецепт пирога", author=cls.author
+        )
+        Comment.objects.create(
+            post=cls.other_post, author=cls.author, text="Вкусный пирог"
+        )
+
+    def setUp(self):
+        self.backend = PostgresSearchBackend()
+
+    def test_finds_posts_by_text_and_comments(self):
+        self.assertEqual(self.backend.search("парки", 0, 10), [self.post.pk])
+        self.assertEqual(
+            self.backend.search("вкусный", 0, 10), [self.other_post.pk]
+        )
+
+    def test_ranks_and_pages_results(self):
+        best = Post.objects.create(
+            text="Пирога много: пирога хватит всем", author=self.author
+        )
+        self.assertEqual(
+            self.backend.search("пирог", 0, 10), [best.pk, self.other_post.pk]
+        )
+        self.assertEqual(
+            self.backend.search("пирог", 1, 10), [self.other_post.pk]
+        )
+
+    def test_view_uses_backend(self):
+        response = self.client.get(reverse("search"), {"q": "парку"})
+        self.assertEqual(list(response.context["page"]), [self.post])
+
+
+class SearchBackendInterfaceTests(TestCase):
+    def test_search_is_required(self):
+        class Incomplete(SearchBackend):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        cls.post = Post.objects.create(
+            text="Запись", author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(ConditionalGetTests.reader)
+        self.urls = {
+            "index": reverse("index"),
+            "group": reverse("group_slug", args=["group"]),
+            "profile": reverse("profile", args=["author"]),
+            "post": reverse("post_view", args=["author", self.post.pk]),
+        }
+
+    def revalidate(self, client, url, response):
+        return client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+    def test_unchanged_pages_return_304(self):
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.guest_client.get(url)
+                self.assertIn("Last-Modified", response)
+                repeated = self.revalidate(self.guest_client, url, response)
+                self.assertEqual(repeated.status_code, 304)
+                repeated = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+                )
+                self.assertEqual(repeated.status_code, 304)
+
+    def test_etag_depends_on_user(self):
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                guest = self.guest_client.get(url)
+                reader = self.reader_client.get(url)
+                self.assertNotEqual(guest["ETag"], reader["ETag"])
+                self.assertNotIn("Last-Modified", reader)
+                repeated = self.revalidate(self.guest_client, url, reader)
+                self.assertEqual(repeated.status_code, 200)
+
+    def test_new_comment_changes_validators(self):
+        responses = {
+            name: self.guest_client.get(url)
+            for name, url in self.urls.items()
+        }
+        Comment.objects.create(
+            post=self.post, author=self.reader, text="Ответ"
+        )
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                repeated = self.revalidate(
+                    self.guest_client, url, responses[name]
+                )
+                self.assertEqual(repeated.status_code, 200)
+
+    def test_follow_changes_author_pages(self):
+        responses = {
+            name: self.guest_client.get(self.urls[name])
+            for name in ("profile", "post")
+        }
+        Follow.objects.create(user=self.reader, author=self.author)
+        for name, response in responses.items():
+            with self.subTest(page=name):
+                repeated = self.revalidate(
+                    self.guest_client, self.urls[name], response
+                )
+                self.assertEqual(repeated.status_code, 200)
+
+    def test_group_change_changes_post_validators(self):
+        url = self.urls["post"]
+        response = self.guest_client.get(url)
+        # Last-Modified точен до секунды: группа меняется позже.
+        Group.objects.filter(pk=self.group.pk).update(
+            title="Новое название",
+            updated=self.group.updated + timedelta(seconds=5),
+        )
+        repeated = self.revalidate(self.guest_client, url, response)
+        self.assertEqual(repeated.status_code, 200)
+        repeated = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(repeated.status_code, 200)
+
+    def test_missing_pages_have_no_validators(self):
+        for url in (
+            reverse("profile", args=["nobody"]),
+            reverse("post_view", args=["author", self.post.pk + 100]),
+        ):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertNotIn("ETag", response)
+
+
+class GuestPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.other = User.objects.create_user(username="other")
+        cls.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        cls.other_group = Group.objects.create(
+            title="Другая", slug="other-group", description="Описание"
+        )
+        cls.post = Post.objects.create(
+            text="Запись", author=cls.author, group=cls.group
+        )
+        cls.other_post = Post.objects.create(
+            text="Другая запись", author=cls.other
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.urls = {
+            "index": reverse("index"),
+            "group": reverse("group_slug", args=["group"]),
+            "other_group": reverse("group_slug", args=["other-group"]),
+            "profile": reverse("profile", args=["author"]),
+            "other_profile": reverse("profile", args=["other"]),
+            "post": reverse("post_view", args=["author", self.post.pk]),
+            "other_post": reverse(
+                "post_view", args=["other", self.other_post.pk]
+            ),
+        }
+        for url in self.urls.values():
+            self.guest_client.get(url)
+
+    def cached(self):
+        return {
+            name for name, url in self.urls.items()
+            if self.guest_client.get(url)["X-Page-Cache"] == "hit"
+        }
+
+    def test_repeated_guest_request_is_served_from_cache(self):
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(self.urls["index"])
+        self.assertEqual(response["X-Page-Cache"], "hit")
+        self.assertContains(response, "Запись")
+
+    def test_query_string_is_part_of_key(self):
+        response = self.guest_client.get(self.urls["index"] + "?after=x")
+        self.assertEqual(response["X-Page-Cache"], "miss")
+
+    def test_session_bypasses_cache(self):
+        client = Client()
+        client.force_login(GuestPageCacheTests.author)
+        response = client.get(self.urls["index"])
+        self.assertNotIn("X-Page-Cache", response)
+
+    def test_comment_purges_only_affected_pages(self):
+        Comment.objects.create(
+            post=self.post, author=self.other, text="Ответ"
+        )
+        self.assertEqual(
+            self.cached(), {"other_group", "other_profile", "other_post"}
+        )
+
+    def test_follow_purges_both_profiles(self):
+        Follow.objects.create(user=self.other, author=self.author)
+        self.assertEqual(self.cached(), {"index", "group", "other_group"})
+
+    def test_moving_post_purges_old_group(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(self.cached(), {"other_profile", "other_post"})
+
+    def test_group_change_purges_pages_with_group_titles(self):
+        self.group.title = "Новое название"
+        self.group.save()
+        self.assertEqual(self.cached(), set())
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.post = Post.objects.create(text="Обсуждаемая", author=cls.author)
+        cls.quiet_post = Post.objects.create(text="Тихая", author=cls.author)
+        Comment.objects.create(
+            post=cls.quiet_post, author=cls.reader, text="Единственный"
+        )
+        Comment.objects.bulk_create(
+            Comment(
+                post=cls.post,
+                author=(cls.author, cls.reader)[i % 2],
+                text=f"Ответ {i}"
+            )
+            for i in range(10000)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def post_view(self, post, **params):
+        url = reverse("post_view", args=["author", post.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_many_comments_cost_as_much_as_one(self):
+        _, quiet_queries = self.post_view(CommentPaginationTests.quiet_post)
+        cache.clear()
+        started = time.monotonic()
+        response, queries = self.post_view(CommentPaginationTests.post)
+        elapsed = time.monotonic() - started
+        self.assertEqual(queries, quiet_queries)
+        self.assertLess(elapsed, 2)
+        self.assertEqual(
+            len(response.context["comments"]), COMMENTS_ON_PAGE
+        )
+        self.assertContains(response, "Показать ещё")
+
+    def test_page_is_cut_from_comment_list(self):
+        response, _ = self.post_view(CommentPaginationTests.post)
+        comment_list = response.context["comment_list"]
+        self.assertIs(
+            response.context["comments"].paginator.object_list, comment_list
+        )
+        self.assertIsNone(comment_list._result_cache)
+
+    def test_comments_continue_after_cursor(self):
+        response, _ = self.post_view(CommentPaginationTests.post)
+        first = response.context["comments"]
+        url = reverse("post_comments", args=["author", self.post.pk])
+        fragment = self.client.get(url, {"after": first.next_cursor})
+        second = fragment.context["comments"]
+        self.assertTemplateUsed(fragment, "includes/comment_list.html")
+        self.assertEqual(len(second), COMMENTS_ON_PAGE)
+        self.assertLess(
+            (second[0].created, second[0].pk),
+            (first[-1].created, first[-1].pk)
+        )
+        data = self.client.get(
+            url, {"after": first.next_cursor, "format": "json"}
+        ).json()
+        self.assertEqual(
+            [item["id"] for item in data["comments"]],
+            [comment.pk for comment in second]
+        )
+        self.assertEqual(data["next"], second.next_cursor)
+
+    def test_last_page_has_no_cursor(self):
+        url = reverse("post_comments", args=["author", self.quiet_post.pk])
+        data = self.client.get(url, {"format": "json"}).json()
+        self.assertEqual(len(data["comments"]), 1)
+        self.assertIsNone(data["next"])
@@ -0,0 +1,23 @@
+from django.apps import apps
+from django.db import connection
+from django.test import SimpleTestCase
+
+from .. import workers
+
+
+def worker_state():
+    return apps.ready, connection.connection is None
+
+
+class WorkerPoolTests(SimpleTestCase):
+    def test_workers_start_without_parent_connections(self):
+        executor = workers.get_executor("test", 1)
+        self.addCleanup(workers._executors.pop, "test")
+        self.addCleanup(executor.shutdown)
+        # Django в процессе настроен, а соединения родителя в нём нет.
+        self.assertEqual(
+            executor.submit(worker_state).result(timeout=60), (True, True)
+        )
+        self.assertEqual(
+            executor._mp_context.get_start_method(), "spawn"
+        )
@@ -0,0 +1,95 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import delete, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from . import workers
+from .models import Post
+from .storage import post_image_storage
+
+logger = logging.getLogger(__name__)
+
+# Размер, в котором записи выводятся в ленте и на странице записи.
+CARD_GEOMETRY = "960x339"
+CARD_OPTIONS = {"crop": "center", "upscale": True}
+# Ширины той же обрезки для srcset: телефоны берут узкий вариант.
+CARD_WIDTHS = (320, 640, 960)
+
+
+def generate_thumbnails(post_id):
+    post = Post.objects.filter(pk=post_id).only("image").first()
+    if post is None or not post.image:
+        return
+    # Одинаковые картинки хранятся одним файлом: если у другой записи
+    # миниатюра уже есть, она подходит и этой.
+    thumbnail = Post.objects.filter(image=post.image.name).exclude(
+        pk=post_id
+    ).exclude(thumbnail_srcset="").values(
+        "thumbnail_url", "thumbnail_width", "thumbnail_height",
+        "thumbnail_srcset",
+    ).first()
+    if thumbnail is None:
+        card = get_thumbnail(post.image, CARD_GEOMETRY, **CARD_OPTIONS)
+        thumbnail = {
+            "thumbnail_url": card.url,
+            "thumbnail_width": card.width,
+            "thumbnail_height": card.height,
+            "thumbnail_srcset": card_srcset(post.image, card),
+        }
+    # Если картинку успели заменить, результат уже не нужен.
+    Post.objects.filter(pk=post_id, image=post.image.name).update(
+        updated=timezone.now(), **thumbnail
+    )
+
+
+def card_srcset(image, card):
+    width, height = map(int, CARD_GEOMETRY.split("x"))
+    variants = [
+        get_thumbnail(
+            image, f"{size}x{round(size * height / width)}", **CARD_OPTIONS
+        )
+        for size in CARD_WIDTHS if size < width
+    ]
+    return ", ".join(
+        f"{variant.url} {variant.width}w" for variant in (*variants, card)
+    )
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error("Не удалось подготовить миниатюры: %s", error)
+
+
+def _submit(post_id):
+    if not settings.THUMBNAIL_WORKERS:
+        generate_thumbnails(post_id)
+        return
+    future = workers.get_executor(
+        "thumbnails", settings.THUMBNAIL_WORKERS
+    ).submit(generate_thumbnails, post_id)
+    future.add_done_callback(_log_failure)
+
+
+def schedule_thumbnails(post):
+    """Сбрасывает миниатюры записи и ставит их генерацию в очередь."""
+    Post.objects.filter(pk=post.pk).update(
+        thumbnail_url="", thumbnail_width=None, thumbnail_height=None,
+        thumbnail_srcset="", updated=timezone.now(),
+    )
+    if post.image:
+        transaction.on_commit(lambda: _submit(post.pk))
+
+
+def _forget_image(name):
+    if post_image_storage.release(name):
+        delete(ImageFile(name, post_image_storage), delete_file=False)
+
+
+def release_image(name):
+    """После коммита снимает ссылку записи на картинку; если файл удалён,
+    удаляет и его миниатюры."""
+    transaction.on_commit(lambda: _forget_image(name))
@@ -0,0 +1,122 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+BATCH_SIZE = 1000
+FEED_KEYS = ("feed_date", "feed_pk")
+
+
+def is_heavy(author_id):
+    """Подписчиков слишком много, чтобы раскладывать записи по лентам."""
+    return AuthorStats.objects.filter(
+        user_id=author_id, timeline_fanout=False
+    ).exists()
+
+
+def update_fanout(author_id):
+    """Переключает автора между раскладкой и чтением напрямую, когда
+    число подписчиков пересекает ``TIMELINE_FANOUT_LIMIT``.
+
+    Перешедшему порог автору ленты больше не нужны, и его записи из них
+    убираются. Вернувшемуся под порог — раскладываются заново, включая
+    записи, опубликованные без раскладки. Назад автор переключается
+    с запасом в десятую часть порога, чтобы не перестраивать ленты на
+    каждой подписке и отписке у самой границы.
+    """
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    stats = AuthorStats.objects.filter(user_id=author_id).values_list(
+        "followers_count", "timeline_fanout"
+    ).first()
+    if stats is None:
+        return
+    followers_count, fanout = stats
+    if fanout:
+        switch = followers_count >= limit
+    else:
+        switch = followers_count < limit - limit // 10
+    if not switch:
+        return
+    with transaction.atomic():
+        # Переключает только один из одновременных вызовов.
+        switched = AuthorStats.objects.filter(
+            user_id=author_id, timeline_fanout=fanout
+        ).update(timeline_fanout=not fanout)
+        if not switched:
+            return
+        if fanout:
+            TimelineEntry.objects.filter(post__author_id=author_id).delete()
+            return
+        backfill_followers(author_id, Follow.objects.filter(
+            author_id=author_id
+        ).values_list("user_id", flat=True))
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    if is_heavy(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list("user_id", flat=True)
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    backfill_followers(author_id, [user_id])
+
+
+def backfill_followers(author_id, user_ids):
+    """Раскладывает записи автора по лентам ``user_ids``, читая записи
+    один раз на всех подписчиков."""
+    if is_heavy(author_id):
+        return
+    posts = list(Post.objects.filter(
+        author_id=author_id
+    ).order_by().values_list("pk", "pub_date"))
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for user_id in user_ids
+        for pk, pub_date in posts
+    )
+
+
+def trim(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def timeline_posts(user):
+    """Записи ленты подписок: из материализованной ленты и, для авторов
+    с огромным числом подписчиков, напрямую из их записей.
+
+    Ключи пагинации ``feed_date``/``feed_pk`` берутся из ленты, чтобы
+    страница читалась по её индексу без сортировки.
+    """
+    heavy_authors = list(Follow.objects.filter(
+        user=user, author__stats__timeline_fanout=False
+    ).values_list("author_id", flat=True))
+    if not heavy_authors:
+        return Post.objects.filter(timeline_entries__user=user).annotate(
+            feed_date=F("timeline_entries__pub_date"),
+            feed_pk=F("timeline_entries__post_id"),
+        )
+    entries = TimelineEntry.objects.filter(user=user).values("post_id")
+    return Post.objects.filter(
+        Q(pk__in=entries) | Q(author_id__in=heavy_authors)
+    ).annotate(feed_date=F("pub_date"), feed_pk=F("pk"))
@@ -0,0 +1,56 @@
+"""Потоковый перенос контента в JSONL и обратно.
+
+Каждая модель выгружается в свой файл, по строке на объект. Пользователи
+и группы связываются по естественным ключам (``username``, ``slug``),
+записи и комментарии сохраняют первичные ключи, поэтому загружаются
+только в базу без записей. Картинки записей копируются в подкаталог
+``media``. Пароли не выгружаются: загруженные пользователи получают
+непригодный пароль и смогут войти только после его сброса.
+"""
+import json
+import os
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Порядок важен: при загрузке ссылки должны указывать на уже созданное.
+FILES = ("users", "groups", "posts", "comments", "follows")
+MEDIA_DIR = "media"
+EXPORT_CHECKPOINT = "export-checkpoint.json"
+IMPORT_CHECKPOINT = "import-checkpoint.json"
+
+
+def data_path(directory, name):
+    return os.path.join(directory, f"{name}.jsonl")
+
+
+def dump_line(record):
+    return (json.dumps(
+        record, cls=DjangoJSONEncoder, ensure_ascii=False
+    ) + "\n").encode()
+
+
+class Checkpoint:
+    """Прогресс по файлам, переживающий перезапуск команды."""
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {}
+        if os.path.exists(path):
+            with open(path) as checkpoint_file:
+                self.state = json.load(checkpoint_file)
+
+    def get(self, name):
+        return self.state.get(name, {})
+
+    def save(self, name, **progress):
+        self.state[name] = progress
+        # Запись через временный файл: обрыв не оставит битый JSON.
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as checkpoint_file:
+            json.dump(self.state, checkpoint_file)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        self.state = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -5,8 +5,14 @@ from . import views
 urlpatterns = [
     path("", views.index, name="index"),
     path("group/<slug:slug>/", views.group_posts, name="group_slug"),
+    path(
+        "group/<slug:slug>/follow/",
+        views.group_follow,
+        name="group_follow"
+    ),
     path("new/", views.new_post, name="new_post"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("search/", views.search, name="search"),
     path("<str:username>/", views.profile, name="profile"),
     path("<str:username>/<int:post_id>/", views.post_view, name="post_view"),
     path(
@@ -14,6 +20,11 @@ urlpatterns = [
         views.post_edit,
         name="post_edit"
     ),
+    path(
+        "<str:username>/<int:post_id>/comments/",
+        views.post_comments,
+        name="post_comments"
+    ),
     path(
         "<str:username>/<int:post_id>/comment/",
         views.add_comment,
@@ -1,34 +1,66 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import condition
 
+from . import conditional, follows
+from .feed_cache import feed_generation
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .images import limit_uploads
+from .models import AuthorStats, Follow, Group, Post
+from .page_cache import cache_page_for_guests
+from .paginators import CursorPaginator, paginate
+from .search import SearchPaginator
+from .serializers import json_response, serialize_comment
+from .thumbnails import schedule_thumbnails
+from .timeline import FEED_KEYS, timeline_posts
 
 User = get_user_model()
 
 ENTRIES_ON_PAGE = 10
+COMMENTS_ON_PAGE = 20
 
 
+@condition(conditional.feed_etag, conditional.feed_modified)
+@cache_page_for_guests(lambda: ["feed", "groups"])
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, ENTRIES_ON_PAGE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
-    return render(request, "posts/index.html", {"page": page})
+    post_list = Post.objects.for_feed()
+    # Страницу читаем, только если фрагмент ленты не нашёлся в кеше.
+    page = SimpleLazyObject(
+        lambda: paginate(request, post_list, ENTRIES_ON_PAGE)
+    )
+    return render(request, "posts/index.html", {
+        "page": page,
+        "feed_generation": feed_generation(),
+        "feed_cache_timeout": settings.FEED_CACHE_TIMEOUT,
+    })
 
 
+@condition(conditional.feed_etag, conditional.feed_modified)
+@cache_page_for_guests(lambda slug: ["groups", f"group.{slug}"])
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    group_posts = group.posts.all()
-    paginator = Paginator(group_posts, ENTRIES_ON_PAGE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    group_posts = group.posts.for_feed()
+    page = paginate(request, group_posts, ENTRIES_ON_PAGE)
     return render(request, "group.html", {"group": group, "page": page})
 
 
+def search(request):
+    query = request.GET.get("q", "").strip()
+    page = None
+    if query:
+        paginator = SearchPaginator(query, ENTRIES_ON_PAGE)
+        page = paginator.get_page(request.GET.get("page"))
+    return render(request, "posts/search.html", {
+        "query": query,
+        "page": page
+    })
+
+
 @login_required
+@limit_uploads
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if request.method == "GET" or not form.is_valid():
@@ -39,15 +71,16 @@ def new_post(request):
     post = form.save(commit=False)
     post.author = request.user
     post.save()
+    schedule_thumbnails(post)
     return redirect("index")
 
 
+@condition(conditional.profile_etag, conditional.profile_modified)
+@cache_page_for_guests(lambda username: ["groups", f"author.{username}"])
 def profile(request, username):
     author_card = get_object_or_404(User, username=username)
-    post_list = author_card.posts.all()
-    paginator = Paginator(post_list, ENTRIES_ON_PAGE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    post_list = author_card.posts.for_feed()
+    page = paginate(request, post_list, ENTRIES_ON_PAGE)
     following = (
         request.user.is_authenticated
         and Follow.objects.filter(
@@ -57,15 +90,20 @@ def profile(request, username):
     return render(request, "posts/profile.html", {
         "page": page,
         "author_card": author_card,
+        "author_stats": AuthorStats.objects.for_author(author_card),
         "following": following
     })
 
 
+@condition(conditional.post_etag, conditional.post_modified)
+@cache_page_for_guests(lambda username, post_id: [
+    "groups", f"author.{username}", f"post.{post_id}"
+])
 def post_view(request, username, post_id):
     post = get_object_or_404(Post, pk=post_id, author__username=username)
     author_card = post.author
     form = CommentForm()
-    comments = post.comments.all()
+    comments = comments_page(request, post)
     following = (
         request.user.is_authenticated
         and Follow.objects.filter(
@@ -74,14 +112,43 @@ def post_view(request, username, post_id):
     )
     return render(request, "posts/post.html", {
         "author_card": author_card,
+        "author_stats": AuthorStats.objects.for_author(author_card),
         "post": post,
         "form": form,
         "comments": comments,
+        # QuerySet, из которого по курсору вырезана страница ``comments``;
+        # целиком он не читается.
+        "comment_list": comments.paginator.object_list,
         "following": following
     })
 
 
+def comments_page(request, post):
+    paginator = CursorPaginator(
+        post.comments.select_related("author"), COMMENTS_ON_PAGE,
+        keys=("created", "pk"),
+    )
+    return paginator.get_page(after=request.GET.get("after"))
+
+
+@cache_page_for_guests(lambda username, post_id: [f"post.{post_id}"])
+def post_comments(request, username, post_id):
+    """Следующая порция комментариев: HTML-фрагмент или JSON."""
+    post = get_object_or_404(Post, pk=post_id, author__username=username)
+    comments = comments_page(request, post)
+    if request.GET.get("format") == "json":
+        return json_response({
+            "comments": [serialize_comment(comment) for comment in comments],
+            "next": comments.next_cursor,
+        })
+    return render(request, "includes/comment_list.html", {
+        "post": post,
+        "comments": comments
+    })
+
+
 @login_required
+@limit_uploads
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, pk=post_id, author__username=username)
     if request.user != post.author:
@@ -91,7 +158,9 @@ def post_edit(request, username, post_id):
     )
     if request.method == "GET" or not form.is_valid():
         return render(request, "posts/new.html", {"form": form, "post": post})
-    form.save()
+    post = form.save()
+    if "image" in form.changed_data:
+        schedule_thumbnails(post)
     return redirect("post_view", username=username, post_id=post_id)
 
 
@@ -122,24 +191,26 @@ def add_comment(request, username, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, ENTRIES_ON_PAGE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    post_list = timeline_posts(request.user).for_feed()
+    page = paginate(request, post_list, ENTRIES_ON_PAGE, FEED_KEYS)
     return render(request, "posts/follow.html", {"page": page})
 
 
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if request.user != author:
-        Follow.objects.get_or_create(user=request.user, author=author)
+    follows.follow(request.user.pk, [author.pk])
     return redirect("profile", username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    if request.user != author:
-        Follow.objects.filter(user=request.user, author=author).delete()
+    follows.unfollow(request.user.pk, author__username=username)
     return redirect("profile", username=username)
+
+
+@login_required
+def group_follow(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    follows.follow_group(request.user.pk, group)
+    return redirect("group_slug", slug=slug)
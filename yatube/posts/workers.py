@@ -0,0 +1,30 @@
+"""Пулы процессов для фоновой работы, запускаемой из веб-процесса.
+
+Процессы запускаются через spawn, а не fork. Дочерний процесс после fork
+наследует соединения родителя с базой, и ни пользоваться ими, ни
+закрывать их нельзя: у PostgreSQL закрытие шлёт серверу завершение по
+общему сокету и обрывает сессию родителя. Запущенный через spawn процесс
+сам настраивает Django и открывает свои соединения.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+
+_executors = {}
+
+
+def _init_worker():
+    django.setup()
+
+
+def get_executor(name, max_workers):
+    """Пул ``name`` на ``max_workers`` процессов, общий для всего модуля."""
+    executor = _executors.get(name)
+    if executor is None:
+        executor = _executors[name] = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return executor
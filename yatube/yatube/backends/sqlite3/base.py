@@ -0,0 +1,22 @@
+"""SQLite с журналом WAL для боевого профиля настроек.
+
+В режиме WAL читатели не блокируют писателя и наоборот, а
+``synchronous=NORMAL`` синхронизирует диск только на контрольных точках:
+последние транзакции может потерять сбой питания, но не падение процесса.
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    # Ждать освободившейся блокировки, а не сразу падать с ошибкой.
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
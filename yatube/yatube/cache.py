@@ -0,0 +1,263 @@
+"""Бэкенды кеша, общие для нескольких процессов.
+
+``SQLiteCache`` хранит значения в файле SQLite, который открывают все
+воркеры машины, и не требует отдельного сервиса. ``TwoTierCache`` ставит
+перед общим кешем небольшой LRU-кеш в памяти процесса. Классы
+``Instrumented*`` дополнительно считают попадания для ``yatube.metrics``.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .metrics import CacheMetricsMixin
+
+# Ключи поколений входят в ключи остального кеша, поэтому читаются только
+# из общего кеша: после инвалидации ни один процесс не увидит старые данные.
+GENERATION_MARK = ":generation"
+
+_missing = object()
+
+
+class SQLiteCache(BaseCache):
+    """Кеш в файле SQLite; LOCATION — путь к файлу."""
+
+    # Раз в столько записей удаляются просроченные ключи.
+    cull_every = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork.
+        pid, conn = getattr(self._local, "conn", (None, None))
+        if pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)"
+            )
+            self._local.conn = (os.getpid(), conn)
+        return conn
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _alive(expires):
+        return expires is None or expires > time.time()
+
+    def get(self, key, default=None, version=None):
+        row = self._connection().execute(
+            "SELECT value, expires FROM cache WHERE key = ?",
+            (self._key(key, version),),
+        ).fetchone()
+        if row is None or not self._alive(row[1]):
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) "
+            "VALUES (?, ?, ?)",
+            (
+                self._key(key, version),
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                self.get_backend_timeout(timeout),
+            ),
+        )
+        self._maybe_cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connection().execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "value = excluded.value, expires = excluded.expires "
+            "WHERE cache.expires IS NOT NULL AND cache.expires <= ?",
+            (
+                self._key(key, version),
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                self.get_backend_timeout(timeout),
+                time.time(),
+            ),
+        )
+        self._maybe_cull()
+        return cursor.rowcount > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connection().execute(
+            "UPDATE cache SET expires = ? "
+            "WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (
+                self.get_backend_timeout(timeout),
+                self._key(key, version),
+                time.time(),
+            ),
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        cursor = self._connection().execute(
+            "DELETE FROM cache WHERE key = ?", (self._key(key, version),)
+        )
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version) is not _missing
+
+    def incr(self, key, delta=1, version=None):
+        # BEGIN IMMEDIATE: чтение и запись счётчика не пересекутся с
+        # другим процессом.
+        conn = self._connection()
+        db_key = self._key(key, version)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, expires FROM cache WHERE key = ?", (db_key,)
+            ).fetchone()
+            if row is None or not self._alive(row[1]):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            conn.execute(
+                "UPDATE cache SET value = ? WHERE key = ?",
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), db_key),
+            )
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return value
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def _maybe_cull(self):
+        self._writes += 1
+        if self._writes % self.cull_every:
+            return
+        conn = self._connection()
+        conn.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        count = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if count > self._max_entries:
+            # Первыми уходят ключи, которым раньше всех истекать.
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                "ORDER BY expires IS NULL, expires LIMIT ?)",
+                (count // self._cull_frequency,),
+            )
+
+
+class TwoTierCache(BaseCache):
+    """LRU-кеш процесса перед общим кешем.
+
+    LOCATION — псевдоним общего кеша в ``CACHES``. Запись и удаление сразу
+    уходят в общий кеш и в память своего процесса; другие процессы держат
+    прочитанную копию не дольше ``LOCAL_TIMEOUT`` секунд. Ключи поколений
+    (с ``GENERATION_MARK``) в памяти процесса не хранятся.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.shared_alias = location
+        self.local_timeout = options.get("LOCAL_TIMEOUT", 5)
+        # Память процесса общая для всех его потоков.
+        self.local = LocMemCache(f"two-tier-{location}", {
+            "TIMEOUT": self.local_timeout,
+            "OPTIONS": {"MAX_ENTRIES": self._max_entries},
+        })
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    @staticmethod
+    def _cached_locally(key):
+        return GENERATION_MARK not in key
+
+    def _local_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self.local_timeout
+        return min(timeout, self.local_timeout)
+
+    def _remember(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self._cached_locally(key):
+            return
+        timeout = self._local_timeout(timeout)
+        if timeout > 0:
+            self.local.set(key, value, timeout, version)
+        else:
+            self.local.delete(key, version)
+
+    def get(self, key, default=None, version=None):
+        if self._cached_locally(key):
+            value = self.local.get(key, _missing, version)
+            if value is not _missing:
+                return value
+        value = self.shared.get(key, _missing, version)
+        if value is _missing:
+            return default
+        self._remember(key, value, version=version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self._remember(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self._remember(key, value, timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.local.delete(key, version)
+        return self.shared.delete(key, version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version) is not _missing
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(key, version)
+        return self.shared.incr(key, delta, version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+
+class InstrumentedLocMemCache(CacheMetricsMixin, LocMemCache):
+    pass
+
+
+class InstrumentedFileBasedCache(CacheMetricsMixin, FileBasedCache):
+    pass
+
+
+class InstrumentedSQLiteCache(CacheMetricsMixin, SQLiteCache):
+    pass
+
+
+class InstrumentedTwoTierCache(CacheMetricsMixin, TwoTierCache):
+    pass
@@ -0,0 +1,94 @@
+"""Чтение с реплик для страниц, которые ничего не меняют.
+
+``ReplicaRoutingMiddleware`` отмечает запросы к представлениям из
+``READ_VIEWS``, и на время такого запроса ``ReplicaRouter`` отправляет
+чтение на одну из баз ``settings.DATABASE_REPLICAS``. После записи браузер
+на ``REPLICA_PIN_SECONDS`` закрепляется за основной базой, чтобы автор
+сразу видел свои изменения, даже если реплика отстаёт.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+READ_VIEWS = frozenset((
+    "index", "group_slug", "profile", "post_view", "post_comments",
+    "follow_index", "about:author", "about:tech", "api:index",
+    "api:group_slug", "api:profile", "api:post_view", "api:follow_index",
+))
+# Подписка и отписка меняют данные GET-запросом, поэтому перечислены явно.
+WRITE_VIEWS = frozenset((
+    "new_post", "post_edit", "add_comment", "profile_follow",
+    "profile_unfollow", "group_follow",
+))
+# Сессии и пользователи всегда читаются из основной базы: отставание
+# реплики не должно разлогинивать только что вошедшего пользователя.
+PRIMARY_APPS = frozenset(("auth", "sessions"))
+PIN_COOKIE = "primary_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_local = threading.local()
+
+
+@contextmanager
+def primary_reads():
+    """Внутри блока чтение идёт из основной базы и в ``READ_VIEWS``."""
+    previous = getattr(_local, "use_replicas", False)
+    _local.use_replicas = False
+    try:
+        yield
+    finally:
+        _local.use_replicas = previous
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas
+            or not getattr(_local, "use_replicas", False)
+            or model._meta.app_label in PRIMARY_APPS
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Объект, прочитанный с реплики, всё равно сохраняется в основную.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схему реплики получают от основной базы вместе с данными.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.use_replicas = False
+        match = request.resolver_match
+        if request.method not in SAFE_METHODS or (
+            match and match.view_name in WRITE_VIEWS
+        ):
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _local.use_replicas = (
+            request.method in SAFE_METHODS
+            and request.resolver_match.view_name in READ_VIEWS
+            and PIN_COOKIE not in request.COOKIES
+        )
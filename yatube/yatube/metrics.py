@@ -0,0 +1,262 @@
+"""Лёгкие метрики запросов: время, работа с базой, шаблоны и кеш.
+
+``MetricsMiddleware`` собирает показатели каждого запроса, складывает их
+в гистограммы по представлениям и отдаёт сводку в заголовке
+``Server-Timing``. Сводка по всем представлениям доступна персоналу на
+``/metrics/``, вместе с долей попаданий в кеш по префиксам ключей.
+Время шаблонов засекает бэкенд ``TimedDjangoTemplates`` из ``TEMPLATES``.
+"""
+import bisect
+import threading
+import time
+from collections import defaultdict
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import JsonResponse
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import (DjangoTemplates, Template,
+                                             reraise)
+
+# Верхние границы корзин гистограмм; последняя корзина — всё, что больше.
+TIME_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# Префиксы сверх этого числа считаются вместе, в группе OTHER_PREFIX.
+MAX_CACHE_PREFIXES = 100
+OTHER_PREFIX = "other"
+
+_local = threading.local()
+
+
+def current_stats():
+    return getattr(_local, "stats", None)
+
+
+def key_prefix(key):
+    """Группа ключа кеша: ключ без последней, уникальной части.
+
+    ``template.cache.index_page.<хеш>`` -> ``template.cache.index_page``,
+    ``posts:feed:generation`` -> ``posts:feed``.
+    """
+    for separator in (":", "||", "."):
+        if separator in key:
+            return key.rsplit(separator, 1)[0]
+    return key
+
+
+class RequestStats:
+    __slots__ = (
+        "started", "queries", "db_time", "template_time",
+        "template_depth", "cache_hits", "cache_misses",
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Обёртка для connection.execute_wrapper().
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def as_dict(self):
+        labels = [f"<={bound}" for bound in self.bounds]
+        labels.append(f">{self.bounds[-1]}")
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.wall_ms = Histogram(TIME_BUCKETS_MS)
+        self.db_ms = Histogram(TIME_BUCKETS_MS)
+        self.template_ms = Histogram(TIME_BUCKETS_MS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, wall_ms, stats):
+        self.wall_ms.add(wall_ms)
+        self.db_ms.add(stats.db_time * 1000)
+        self.template_ms.add(stats.template_time * 1000)
+        self.queries.add(stats.queries)
+        self.cache_hits += stats.cache_hits
+        self.cache_misses += stats.cache_misses
+
+    def as_dict(self):
+        return {
+            "wall_ms": self.wall_ms.as_dict(),
+            "db_ms": self.db_ms.as_dict(),
+            "template_ms": self.template_ms.as_dict(),
+            "queries": self.queries.as_dict(),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = defaultdict(ViewMetrics)
+        self._cache = {}
+
+    def record(self, view_name, wall_ms, stats):
+        with self._lock:
+            self._views[view_name].add(wall_ms, stats)
+
+    def record_cache(self, key, hits, misses):
+        prefix = key_prefix(key)
+        with self._lock:
+            counts = self._cache.get(prefix)
+            if counts is None:
+                if len(self._cache) >= MAX_CACHE_PREFIXES:
+                    prefix = OTHER_PREFIX
+                counts = self._cache.setdefault(prefix, [0, 0])
+            counts[0] += hits
+            counts[1] += misses
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: metrics.as_dict()
+                for name, metrics in sorted(self._views.items())
+            }
+
+    def cache_snapshot(self):
+        with self._lock:
+            return {
+                prefix: {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_ratio": hits / (hits + misses),
+                }
+                for prefix, (hits, misses) in sorted(self._cache.items())
+                if hits + misses
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+            self._cache.clear()
+
+
+registry = MetricsRegistry()
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = current_stats()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        stats.template_depth += 1
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django, который засекает время отрисовки."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name), self
+            )
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class CacheMetricsMixin:
+    """Считает попадания и промахи кеша по запросам и префиксам ключей.
+
+    ``get_many`` базового кеша читает ключи через ``get``, поэтому
+    отдельно не считается.
+    """
+
+    _missing = object()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing, version)
+        self._count(key, value is not self._missing)
+        return default if value is self._missing else value
+
+    @staticmethod
+    def _count(key, hit):
+        registry.record_cache(key, int(hit), int(not hit))
+        stats = current_stats()
+        if stats is None:
+            return
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = _local.stats = RequestStats()
+        wrappers = [conn.execute_wrapper(stats) for conn in connections.all()]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        try:
+            response = self.get_response(request)
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+            _local.stats = None
+        wall_ms = (time.perf_counter() - stats.started) * 1000
+        match = request.resolver_match
+        view_name = match.view_name if match else "unresolved"
+        registry.record(view_name, wall_ms, stats)
+        response["Server-Timing"] = ", ".join((
+            f"total;dur={wall_ms:.1f}",
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} q"',
+            f"tpl;dur={stats.template_time * 1000:.1f}",
+            f'cache;desc="hit={stats.cache_hits} miss={stats.cache_misses}"',
+        ))
+        return response
+
+
+@staff_member_required
+def metrics_view(request):
+    return JsonResponse({
+        "views": registry.snapshot(),
+        "cache": registry.cache_snapshot(),
+    }, json_dumps_params={"ensure_ascii": False})
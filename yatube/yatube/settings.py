@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -19,15 +21,28 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
 
+# профиль настроек: development (по умолчанию) или production
+PROFILE = os.environ.get('YATUBE_PROFILE', 'development')
+PRODUCTION = PROFILE == 'production'
+
+# в production ключ и хосты задаются только окружением, значения по
+# умолчанию ниже — для разработки
+if PRODUCTION:
+    for variable in ('YATUBE_SECRET_KEY', 'YATUBE_ALLOWED_HOSTS'):
+        if not os.environ.get(variable):
+            raise ImproperlyConfigured(
+                f'В профиле production нужно задать {variable}.'
+            )
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'q8)8xfka1kk8utv#*t%wox+jdlz#=qgwd3a40hs2^!0mn5kd#y'
+SECRET_KEY = os.environ.get(
+    'YATUBE_SECRET_KEY', 'q8)8xfka1kk8utv#*t%wox+jdlz#=qgwd3a40hs2^!0mn5kd#y'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = not PRODUCTION
 
-ALLOWED_HOSTS = [
-    "*",
-]
+ALLOWED_HOSTS = os.environ.get('YATUBE_ALLOWED_HOSTS', '*').split(',')
 
 
 # Application definition
@@ -43,10 +58,11 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
+    'yatube.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,15 +70,21 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, засекающий время отрисовки, см. yatube.metrics;
+        # имя движка остаётся прежним, «django»
+        'BACKEND': 'yatube.metrics.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -77,6 +99,16 @@ TEMPLATES = [
     },
 ]
 
+if PRODUCTION:
+    # шаблоны разбираются один раз за жизнь процесса
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
@@ -87,9 +119,37 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        # тестовая база в файле: потоки в тестах гонок ждут блокировку,
+        # а общая база в памяти сразу отвечает «table is locked»
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
+    },
 }
 
+# реплика только для чтения; локально это может быть копия файла базы
+REPLICA_DB = os.environ.get('YATUBE_REPLICA_DB')
+if REPLICA_DB:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': REPLICA_DB,
+    }
+
+if PRODUCTION:
+    for database in DATABASES.values():
+        # журнал WAL и synchronous=NORMAL, см. yatube/backends/sqlite3
+        database['ENGINE'] = 'yatube.backends.sqlite3'
+        # соединение переживает запрос, а не открывается заново на каждый
+        database['CONN_MAX_AGE'] = int(
+            os.environ.get('YATUBE_CONN_MAX_AGE', 600)
+        )
+
+DATABASE_ROUTERS = ['yatube.db_router.ReplicaRouter']
+
+# базы, с которых читают страницы из yatube.db_router.READ_VIEWS
+DATABASE_REPLICAS = ['replica'] if REPLICA_DB else []
+
+# сколько секунд после записи пользователь читает только из основной базы
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -147,12 +207,79 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
-# подключаем бэкенд кеширования
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+# подключаем бэкенд кеширования: locmem — свой кеш у каждого процесса;
+# file и sqlite — общий для всех процессов машины; two-tier — память
+# процесса перед общим кешем из YATUBE_SHARED_CACHE (file или sqlite)
+CACHE_MODE = os.environ.get('YATUBE_CACHE', 'locmem')
+CACHE_DIR = os.environ.get('YATUBE_CACHE_DIR', os.path.join(BASE_DIR, 'cache'))
+CACHE_LOCATIONS = {
+    'locmem': '',
+    'file': CACHE_DIR,
+    'sqlite': os.path.join(CACHE_DIR, 'cache.sqlite3'),
+}
+# попадания считают классы Instrumented*, см. yatube.metrics
+CACHE_BACKENDS = {
+    'locmem': 'yatube.cache.InstrumentedLocMemCache',
+    'file': 'yatube.cache.InstrumentedFileBasedCache',
+    'sqlite': 'yatube.cache.InstrumentedSQLiteCache',
 }
+if CACHE_MODE == 'two-tier':
+    SHARED_CACHE_MODE = os.environ.get('YATUBE_SHARED_CACHE', 'sqlite')
+    CACHES = {
+        'default': {
+            'BACKEND': 'yatube.cache.InstrumentedTwoTierCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {'LOCAL_TIMEOUT': 5, 'MAX_ENTRIES': 1000},
+        },
+        # без метрик: обращения уже посчитал кеш верхнего уровня
+        'shared': {
+            'BACKEND': {
+                'file': 'django.core.cache.backends.filebased.FileBasedCache',
+                'sqlite': 'yatube.cache.SQLiteCache',
+            }[SHARED_CACHE_MODE],
+            'LOCATION': CACHE_LOCATIONS[SHARED_CACHE_MODE],
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': CACHE_BACKENDS[CACHE_MODE],
+            'LOCATION': CACHE_LOCATIONS[CACHE_MODE],
+        },
+    }
+    if CACHE_MODE != 'locmem':
+        CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': 100000}
+
+# ленту можно держать в кеше долго: она сбрасывается при изменениях
+FEED_CACHE_TIMEOUT = 60 * 5
+
+# страницы для гостей тоже сбрасываются при изменениях, см. posts.page_cache
+PAGE_CACHE_TIMEOUT = 60 * 5
+
+# записи авторов с таким числом подписчиков не раскладываются по лентам
+# подписчиков, а читаются напрямую при открытии ленты подписок
+TIMELINE_FANOUT_LIMIT = 1000
+
+# полнотекстовый поиск; для PostgreSQL — posts.search.PostgresSearchBackend
+SEARCH_BACKEND = "posts.search.SQLiteSearchBackend"
+
+# число процессов, готовящих миниатюры; 0 — готовить прямо в запросе
+THUMBNAIL_WORKERS = 2
+
+# число процессов для массовой модерации из админки, см. posts.moderation;
+# 0 — выполнять задачу прямо в запросе
+MODERATION_WORKERS = 1
+
+# задачу модерации без отметки о ходе дольше стольких секунд считают
+# брошенной и продолжают в run_moderation_jobs
+MODERATION_JOB_LEASE = 300
+
+# ограничения картинок к записям: размер файла, число пикселей и сторона,
+# до которой картинка уменьшается перед сохранением
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+POST_IMAGE_MAX_SIDE = 1920
 
 INTERNAL_IPS = [
     "127.0.0.1",
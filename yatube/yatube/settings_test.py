@@ -0,0 +1,11 @@
+"""Настройки тестов.
+
+``python manage.py test --settings=yatube.settings_test``
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+# тесты маршрутизации читают с отдельной базы в памяти, которая
+# «отстаёт» от основной, и сами включают её через DATABASE_REPLICAS
+DATABASES['replica'] = {'ENGINE': 'django.db.backends.sqlite3'}
+DATABASE_REPLICAS = []
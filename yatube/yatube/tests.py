@@ -0,0 +1,341 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.http import HttpResponse
+from django.template import engines
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from posts.models import AuthorStats, Post
+
+from .cache import (InstrumentedLocMemCache, InstrumentedTwoTierCache,
+                    SQLiteCache, TwoTierCache)
+from .db_router import PIN_COOKIE
+from .metrics import MetricsMiddleware, TimedTemplate, registry
+
+User = get_user_model()
+
+
+class MetricsMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(
+            username="staff", password="123", is_staff=True
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.staff_client = Client()
+        self.staff_client.force_login(MetricsMiddlewareTests.staff)
+        registry.reset()
+        cache.clear()
+
+    def test_server_timing_header(self):
+        response = self.guest_client.get(reverse("index"))
+        timing = response["Server-Timing"]
+        for metric in ("total;dur=", "db;dur=", "tpl;dur=", "cache;desc="):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+
+    def test_metrics_are_aggregated_per_view(self):
+        for _ in range(3):
+            self.guest_client.get(reverse("index"))
+        metrics = registry.snapshot()["index"]
+        self.assertEqual(metrics["wall_ms"]["count"], 3)
+        self.assertGreater(metrics["queries"]["mean"], 0)
+        self.assertGreater(metrics["template_ms"]["mean"], 0)
+        self.assertGreater(metrics["cache_hits"], 0)
+        self.assertGreater(metrics["cache_misses"], 0)
+
+    def test_metrics_endpoint_is_staff_only(self):
+        response = self.guest_client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 302)
+        self.guest_client.get(reverse("index"))
+        response = self.staff_client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        metrics = json.loads(response.content)
+        self.assertIn("index", metrics["views"])
+        self.assertIn("template.cache.index_page", metrics["cache"])
+
+    def test_cache_hit_ratio_per_prefix(self):
+        for _ in range(3):
+            self.guest_client.get(reverse("index"))
+        page = registry.cache_snapshot()["posts:page"]
+        self.assertEqual(page["misses"], 1)
+        self.assertEqual(page["hits"], 2)
+        self.assertAlmostEqual(page["hit_ratio"], 2 / 3)
+
+    def test_get_many_counts_each_key_once(self):
+        metered = InstrumentedLocMemCache("metrics-get-many", {})
+        self.addCleanup(metered.clear)
+        metered.set("a:1", "value")
+        self.assertEqual(metered.get_many(["a:1", "a:2"]), {"a:1": "value"})
+        self.assertEqual(
+            registry.cache_snapshot()["a"], {
+                "hits": 1, "misses": 1, "hit_ratio": 0.5,
+            }
+        )
+
+
+class MetricsOverheadTests(SimpleTestCase):
+    # Замер на разработческой машине: около 16 мкс на запрос и около
+    # 10 мкс на шаблон; границы взяты с большим запасом.
+    ROUNDS = 2000
+    MAX_OVERHEAD_MS = 0.5
+
+    def setUp(self):
+        self.addCleanup(registry.reset)
+
+    def overhead_ms(self, bare, timed):
+        started = time.perf_counter()
+        for _ in range(self.ROUNDS):
+            bare()
+        bare_time = time.perf_counter() - started
+        started = time.perf_counter()
+        for _ in range(self.ROUNDS):
+            timed()
+        timed_time = time.perf_counter() - started
+        return (timed_time - bare_time) / self.ROUNDS * 1000
+
+    def test_templates_use_timed_backend(self):
+        template = engines["django"].from_string("")
+        self.assertIsInstance(template, TimedTemplate)
+
+    def test_middleware_overhead(self):
+        request = RequestFactory().get("/")
+        response = HttpResponse()
+
+        def view(request):
+            return response
+        middleware = MetricsMiddleware(view)
+        overhead = self.overhead_ms(
+            lambda: view(request), lambda: middleware(request)
+        )
+        self.assertLess(overhead, self.MAX_OVERHEAD_MS)
+
+    def test_overhead_with_timed_template(self):
+        template = engines["django"].from_string(
+            "{% for item in items %}{{ item }}{% endfor %}"
+        )
+        context = {"items": range(10)}
+
+        def view(request):
+            template.render(context)
+            return HttpResponse()
+        request = RequestFactory().get("/")
+        middleware = MetricsMiddleware(view)
+        overhead = self.overhead_ms(
+            lambda: view(request), lambda: middleware(request)
+        )
+        self.assertLess(overhead, self.MAX_OVERHEAD_MS)
+
+
+@skipUnless(
+    "replica" in settings.DATABASES, "реплику задают yatube.settings_test"
+)
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Основная база и реплика — две разные базы SQLite.
+
+    Запись создаётся только в основной базе, как будто реплика отстала.
+    """
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author")
+        self.post = Post.objects.create(
+            text="Свежая запись", author=self.author
+        )
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.post_url = reverse("post_view", args=["author", self.post.pk])
+
+    def test_read_views_use_replica(self):
+        self.assertEqual(self.client.get(self.post_url).status_code, 404)
+        response = self.client.get(reverse("profile", args=["author"]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "Свежая запись")
+
+    def test_guest_page_cache_is_filled_from_primary(self):
+        response = Client().get(reverse("profile", args=["author"]))
+        self.assertEqual(response["X-Page-Cache"], "miss")
+        self.assertContains(response, "Свежая запись")
+
+    def test_write_pins_reads_to_primary(self):
+        response = self.client.post(
+            reverse("add_comment", args=["author", self.post.pk]),
+            {"text": "Комментарий"},
+        )
+        self.assertEqual(
+            response.cookies[PIN_COOKIE]["max-age"],
+            settings.REPLICA_PIN_SECONDS,
+        )
+        response = self.client.get(self.post_url)
+        self.assertContains(response, "Комментарий")
+
+    def test_follow_pins_reads_to_primary(self):
+        User.objects.create_user(username="reader")
+        self.client.get(reverse("profile_follow", args=["reader"]))
+        self.assertEqual(self.client.get(self.post_url).status_code, 200)
+
+    def test_writes_go_to_primary(self):
+        self.client.post(reverse("new_post"), {"text": "Новая запись"})
+        self.assertTrue(Post.objects.using("default").filter(
+            text="Новая запись"
+        ).exists())
+        self.assertFalse(Post.objects.using("replica").exists())
+
+    def test_author_stats_are_counted_on_primary(self):
+        AuthorStats.objects.all().delete()
+        self.client.get(reverse("profile", args=["author"]))
+        stats = AuthorStats.objects.using("default").get(user=self.author)
+        self.assertEqual(stats.posts_count, 1)
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(router.allow_migrate("replica", "posts"))
+        self.assertTrue(router.allow_migrate("default", "posts"))
+
+
+class ProductionSettingsTests(SimpleTestCase):
+    def import_settings(self, **environ):
+        env = {
+            key: value for key, value in os.environ.items()
+            if not key.startswith("YATUBE_")
+        }
+        env.update(YATUBE_PROFILE="production", **environ)
+        return subprocess.run(
+            [sys.executable, "-c", "import yatube.settings"],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+
+    def test_secrets_are_required(self):
+        for variable in ("YATUBE_SECRET_KEY", "YATUBE_ALLOWED_HOSTS"):
+            with self.subTest(variable=variable):
+                environ = {
+                    "YATUBE_SECRET_KEY": "secret",
+                    "YATUBE_ALLOWED_HOSTS": "example.com",
+                }
+                del environ[variable]
+                result = self.import_settings(**environ)
+                self.assertNotEqual(result.returncode, 0)
+                self.assertIn("ImproperlyConfigured", result.stderr)
+                self.assertIn(variable, result.stderr)
+
+    def test_configured_production(self):
+        result = self.import_settings(
+            YATUBE_SECRET_KEY="secret", YATUBE_ALLOWED_HOSTS="example.com"
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "cache.sqlite3")
+        self.cache = SQLiteCache(self.path, {})
+
+    def test_values_are_shared_between_instances(self):
+        other = SQLiteCache(self.path, {})
+        self.cache.set("key", {"value": 1})
+        self.assertEqual(other.get("key"), {"value": 1})
+        other.delete("key")
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_add_incr_and_expiry(self):
+        self.assertTrue(self.cache.add("counter", 1))
+        self.assertFalse(self.cache.add("counter", 5))
+        self.assertEqual(self.cache.incr("counter"), 2)
+        self.assertEqual(self.cache.decr("counter", 2), 0)
+        with self.assertRaises(ValueError):
+            self.cache.incr("missing")
+        self.cache.set("expired", 1, -1)
+        self.assertFalse(self.cache.has_key("expired"))
+        self.assertTrue(self.cache.add("expired", 2))
+        self.assertEqual(self.cache.get("expired"), 2)
+
+    def test_cull_keeps_max_entries(self):
+        cache = SQLiteCache(self.path, {"OPTIONS": {"MAX_ENTRIES": 10}})
+        cache.cull_every = 1
+        for i in range(30):
+            cache.set(f"key{i}", i)
+        self.assertLessEqual(
+            sum(cache.has_key(f"key{i}") for i in range(30)), 11
+        )
+        self.assertTrue(cache.has_key("key29"))
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    """Два экземпляра с разной памятью над одним файлом — два процесса."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        shared = {
+            "BACKEND": "yatube.cache.SQLiteCache",
+            "LOCATION": os.path.join(directory, "cache.sqlite3"),
+        }
+        caches_setting = override_settings(CACHES={
+            "default": settings.CACHES["default"],
+            "shared-first": shared,
+            "shared-second": shared,
+        })
+        caches_setting.enable()
+        self.addCleanup(caches_setting.disable)
+        self.first = TwoTierCache("shared-first", {})
+        self.second = TwoTierCache("shared-second", {})
+        self.addCleanup(self.first.clear)
+        self.addCleanup(self.second.clear)
+
+    def test_reads_through_shared_cache(self):
+        self.first.set("key", "value")
+        self.assertEqual(self.second.get("key"), "value")
+        self.assertEqual(self.second.local.get("key"), "value")
+
+    def test_local_copy_is_bounded_by_local_timeout(self):
+        self.first.set("key", "old")
+        self.second.get("key")
+        self.first.set("key", "new")
+        self.assertEqual(self.second.get("key"), "old")
+        self.second.local.delete("key")
+        self.assertEqual(self.second.get("key"), "new")
+
+    def test_generation_keys_are_always_shared(self):
+        key = "posts:feed:generation"
+        self.first.add(key, 1)
+        self.assertEqual(self.second.get(key), 1)
+        self.first.incr(key)
+        self.assertEqual(self.second.get(key), 2)
+        self.assertIsNone(self.second.local.get(key))
+
+    def test_get_many_counts_each_key_once(self):
+        registry.reset()
+        metered = InstrumentedTwoTierCache("shared-second", {})
+        self.addCleanup(metered.clear)
+        self.first.set("a:1", "value")
+        for _ in range(2):
+            # Второй раз ключ читается из памяти процесса.
+            self.assertEqual(
+                metered.get_many(["a:1", "a:2"]), {"a:1": "value"}
+            )
+        counts = registry.cache_snapshot()["a"]
+        self.assertEqual((counts["hits"], counts["misses"]), (2, 2))
+
+    def test_delete_drops_local_copy(self):
+        self.first.set("key", "value")
+        self.first.delete("key")
+        self.assertIsNone(self.first.get("key"))